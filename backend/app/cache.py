@@ -0,0 +1,77 @@
+"""
+Caching for stored analyses.
+
+Stored analyses never change once written, so responses by id can be cached
+indefinitely and served with strong ETags. A session's latest analysis does
+change when it is recomputed; those entries expire after
+ANALYSIS_SESSION_CACHE_TTL, so workers whose cache the recompute didn't update
+(the per-process memory backend) catch up quickly. Entries live in the
+shared-state backend (see app.shared_state), so with several workers or
+replicas a response rendered by one is a cache hit for all of them.
+"""
+
+import hashlib
+import os
+from typing import NamedTuple, Optional
+
+from app.shared_state import get_shared_state
+
+# Bounds storage in the SQL backends; the memory backend also evicts by LRU
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "86400"))
+ANALYSIS_SESSION_CACHE_TTL = int(os.getenv("ANALYSIS_SESSION_CACHE_TTL", "60"))
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    """Build a strong ETag from the exact response bytes."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def render_with_analysis(envelope_json: bytes, analysis_json: bytes) -> bytes:
+    """
+    Append an already-serialized Analysis to a serialized JSON object as its "analysis" field.
+    Lets response bodies reuse the stored Analysis bytes instead of re-encoding them.
+    """
+    if envelope_json == b"{}":
+        return b'{"analysis":' + analysis_json + b"}"
+    return envelope_json[:-1] + b',"analysis":' + analysis_json + b"}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, RFC 7232)."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+class ResponseCache:
+    """Rendered responses stored in the shared-state backend under a key prefix."""
+
+    def __init__(self, prefix: str, ttl: Optional[float] = ANALYSIS_CACHE_TTL):
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raw = get_shared_state().get(f"{self.prefix}:{key}")
+        if raw is None:
+            return None
+        # Stored as etag + newline + body; ETags never contain newlines
+        etag, body = raw.split(b"\n", 1)
+        return CachedResponse(body=body, etag=etag.decode())
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        get_shared_state().set(f"{self.prefix}:{key}", value.etag.encode() + b"\n" + value.body, self.ttl)
+
+    def delete(self, key: str) -> None:
+        get_shared_state().delete(f"{self.prefix}:{key}")
+
+
+analysis_cache = ResponseCache("analysis")
+session_cache = ResponseCache("analysis-session", ttl=ANALYSIS_SESSION_CACHE_TTL)
@@ -1,50 +1,192 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Text, Date, DateTime, Float, Boolean, Index, ForeignKey, LargeBinary
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, relationship, sessionmaker
+from contextlib import contextmanager
 from datetime import datetime
+from app.pool import pool_settings
+from app.storage import decompress, decompress_json
+import json
 import os
+import logging
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Only create engine if DATABASE_URL is provided
-if DATABASE_URL:
-    try:
-        engine = create_engine(DATABASE_URL)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        print(f"Database connected successfully")
-    except Exception as e:
-        print(f"Database connection failed: {e}")
-        engine = None
-        SessionLocal = None
-else:
-    print("No DATABASE_URL provided")
-    engine = None
-    SessionLocal = None
+_engine = None
+_SessionLocal = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    Create the engine on first use rather than at import time.
+    Returns None when DATABASE_URL is not configured.
+    """
+    global _engine, _SessionLocal
+    if _engine is None and DATABASE_URL:
+        with _engine_lock:
+            if _engine is None:
+                # SQLite (local development) keeps SQLAlchemy's default pool
+                if make_url(DATABASE_URL).get_backend_name() == "sqlite":
+                    _engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+                else:
+                    _engine = create_engine(DATABASE_URL, **pool_settings())
+                _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+                logger.info("Database engine created")
+    return _engine
+
+def get_sessionmaker():
+    get_engine()
+    return _SessionLocal
 
 Base = declarative_base()
 
+class JobDescription(Base):
+    """Job description text stored once per distinct content, keyed by its SHA-256."""
+    __tablename__ = "job_description_blob"
+
+    content_hash = Column(String(64), primary_key=True)
+    content = Column(Text, nullable=False)
+    # zstd-compressed extracted_job_data from the first analysis of this description
+    extracted_job_data = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class JobAnalysis(Base):
     __tablename__ = "job_analysis"
     
     id = Column(Integer, primary_key=True, index=True)
-    job_description = Column(Text, nullable=False)
+    description_hash = Column(String(64), ForeignKey("job_description_blob.content_hash"), nullable=False)
     user_email = Column(String(255), nullable=True)
+    session_id = Column(String(255), nullable=True)
+    # Idempotency-Key header or session_id of the /api/analyze request that produced this row;
+    # NULL for recomputes and fallbacks, so those never block a retry
+    idempotency_key = Column(String(255), nullable=True)
     industry = Column(String(100), nullable=False)
-    analysis_result = Column(JSON, nullable=False)
+    # zstd-compressed JSON of the validated Analysis, see app.storage; read through analysis_result
+    analysis_payload = Column(LargeBinary, nullable=False)
+    # zstd-compressed extracted_job_data, NULL when identical to the description's copy
+    extracted_job_data = Column(LargeBinary, nullable=True)
+    # Summary fields copied out of analysis_result so listings and reporting never load the JSON
+    job_title = Column(String(255), nullable=True)
+    job_level = Column(String(50), nullable=True)
+    total_annual_savings = Column(Float, nullable=True)
+    roi_percentage = Column(Float, nullable=True)
+    automation_potential_percentage = Column(Float, nullable=True)
+    is_fallback = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-# Tables will be created by the entrypoint script
-# Base.metadata.create_all(bind=engine)
+    __table_args__ = (
+        # Keyset pagination of history: WHERE owner = ? AND (created_at, id) < (?, ?)
+        Index("ix_job_analysis_user_email_created_at", "user_email", "created_at", "id"),
+        Index("ix_job_analysis_session_id_created_at", "session_id", "created_at", "id"),
+        Index("ix_job_analysis_industry_created_at", "industry", "created_at"),
+        Index("ix_job_analysis_job_title", "job_title"),
+        Index("ix_job_analysis_description_hash", "description_hash"),
+        Index("uq_job_analysis_idempotency_key", "idempotency_key", unique=True),
+    )
+
+    description = relationship(JobDescription, lazy="joined")
+
+    @property
+    def job_description(self) -> str:
+        return self.description.content
+
+    @property
+    def analysis_json(self) -> bytes:
+        """The stored Analysis JSON, byte-for-byte as served by the API."""
+        return decompress(self.analysis_payload)
+
+    @property
+    def extracted_data(self) -> dict | None:
+        if self.extracted_job_data is not None:
+            return decompress_json(self.extracted_job_data)
+        if self.is_fallback or self.description.extracted_job_data is None:
+            return None
+        return decompress_json(self.description.extracted_job_data)
+
+    @property
+    def analysis_result(self) -> dict:
+        analysis_result = json.loads(self.analysis_json)
+        extracted_data = self.extracted_data
+        if extracted_data is not None:
+            analysis_result["extracted_job_data"] = extracted_data
+        return analysis_result
+
+class AnalysisDailyRollup(Base):
+    """Per-day, per-industry totals, maintained incrementally on every insert."""
+    __tablename__ = "analysis_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    industry = Column(String(100), primary_key=True)
+    analysis_count = Column(Integer, nullable=False, default=0)
+    fallback_count = Column(Integer, nullable=False, default=0)
+    total_annual_savings_sum = Column(Float, nullable=False, default=0)
+    roi_percentage_sum = Column(Float, nullable=False, default=0)
+    automation_potential_sum = Column(Float, nullable=False, default=0)
+
+class JobTitleRollup(Base):
+    """Analysis counts per normalized job title and industry."""
+    __tablename__ = "job_title_rollup"
+
+    job_title_key = Column(String(255), primary_key=True)
+    industry = Column(String(100), primary_key=True)
+    job_title = Column(String(255), nullable=False)
+    analysis_count = Column(Integer, nullable=False, default=0)
+
+class SharedStateEntry(Base):
+    """Key/value and counter store shared by every worker, see app.shared_state."""
+    __tablename__ = "shared_state"
+
+    key = Column(String(512), primary_key=True)
+    value = Column(LargeBinary, nullable=True)
+    counter = Column(Integer, nullable=False, default=0)
+    # Unix timestamp; NULL never expires
+    expires_at = Column(Float, nullable=True, index=True)
+
+def dialect_insert(db):
+    """Return the dialect-specific insert() that supports ON CONFLICT clauses for a Session, Connection or Engine."""
+    bind = db.get_bind() if isinstance(db, Session) else db
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+# Tables are created and upgraded by migrations: alembic upgrade head
 
 def get_db():
+    SessionLocal = get_sessionmaker()
+    if SessionLocal is None:
+        raise Exception("Database not configured")
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def session_scope():
+    """
+    Open a session for a short block of DB work.
+    Use this instead of get_db on endpoints that spend most of their time elsewhere
+    (e.g. waiting on OpenAI), so a connection is only checked out around the queries.
+    """
+    SessionLocal = get_sessionmaker()
     if SessionLocal is None:
         raise Exception("Database not configured")
     db = SessionLocal()
     try:
         yield db
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
\ No newline at end of file
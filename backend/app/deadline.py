@@ -0,0 +1,146 @@
+"""
+Request deadlines and hedged upstream calls.
+
+An analysis gets one Deadline when it starts. Each stage derives its own
+timeout from whatever time is left, so a slow extraction shortens the analysis
+stage instead of pushing the request past its budget.
+
+Hedging targets tail latency: when an upstream call has been in flight for longer
+than the model's recent HEDGE_PERCENTILE latency for that stage, and the scheduler
+has an idle slot, a duplicate is started and whichever finishes first wins; the
+other is cancelled. The clock starts at dispatch, so queueing never causes a hedge.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+ANALYZE_DEADLINE_SECONDS = float(os.getenv("ANALYZE_DEADLINE_SECONDS", "60"))
+BACKGROUND_DEADLINE_SECONDS = float(os.getenv("BACKGROUND_DEADLINE_SECONDS", "300"))
+# Share of the remaining time given to extraction; the analysis stage gets the rest
+EXTRACTION_BUDGET_SHARE = float(os.getenv("EXTRACTION_BUDGET_SHARE", "0.35"))
+# Kept back from the analysis stage for post-processing and the DB write
+DEADLINE_RESERVE_SECONDS = float(os.getenv("DEADLINE_RESERVE_SECONDS", "2"))
+# A stage is not retried with less time than this left
+MIN_ATTEMPT_SECONDS = float(os.getenv("MIN_ATTEMPT_SECONDS", "3"))
+# 0 disables hedging
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0"))
+# Latency samples needed before the percentile is trusted
+HEDGE_MIN_SAMPLES = 20
+LATENCY_SAMPLE_SIZE = 200
+
+class Deadline:
+    """Absolute point in time (monotonic clock) by which work must finish."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def stage(self, share: float = 1.0, reserve: float = 0.0) -> "Deadline":
+        """Deadline for one stage: `share` of the remaining time, minus `reserve` kept for later stages."""
+        return Deadline(max(0.0, self.remaining() - reserve) * share)
+
+class LatencyTracker:
+    """Recent upstream latencies (one per model and stage) plus hedging counters."""
+
+    def __init__(self, size: int = LATENCY_SAMPLE_SIZE):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        with self._lock:
+            if not self._samples or len(self._samples) < min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which to hedge, or None when hedging is off or there is too little data."""
+        if HEDGE_PERCENTILE <= 0:
+            return None
+        return self.percentile(HEDGE_PERCENTILE)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95, p99 = (self.percentile(p, min_samples=1) for p in (50, 95, 99))
+        return {
+            "samples": len(self._samples),
+            "p50_ms": p50 * 1000 if p50 is not None else None,
+            "p95_ms": p95 * 1000 if p95 is not None else None,
+            "p99_ms": p99 * 1000 if p99 is not None else None,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+async def hedged(
+    call: Callable[[Optional[asyncio.Event]], Awaitable[Any]],
+    timeout: float,
+    hedge_delay: Optional[float] = None,
+    tracker: Optional[LatencyTracker] = None,
+    can_hedge: Optional[Callable[[], bool]] = None
+) -> Any:
+    """
+    Await call() for at most `timeout` seconds (raises asyncio.TimeoutError).
+    The first attempt is passed an Event to set once it is dispatched upstream, i.e. has its
+    scheduler slot and rate budget; hedges are passed None. With a hedge_delay, a duplicate call()
+    starts once the first attempt has been dispatched for that long and can_hedge() allows it, so
+    time spent queued never triggers a hedge. The first successful result wins.
+    Raises the last error if every attempt fails.
+    """
+    give_up_at = time.monotonic() + timeout
+    hedge_at: Optional[float] = None
+
+    dispatched = asyncio.Event()
+    first = asyncio.create_task(call(dispatched))
+    attempts = {first}
+    # Only watched when there is a hedge to time
+    dispatch_wait = asyncio.create_task(dispatched.wait()) if hedge_delay is not None and hedge_delay < timeout else None
+    error: Optional[BaseException] = None
+    try:
+        while attempts:
+            now = time.monotonic()
+            if now >= give_up_at:
+                raise asyncio.TimeoutError()
+            wake_at = min(give_up_at, hedge_at) if hedge_at is not None else give_up_at
+            waiting = attempts | {dispatch_wait} if dispatch_wait is not None else attempts
+            done, _ = await asyncio.wait(waiting, timeout=wake_at - now, return_when=asyncio.FIRST_COMPLETED)
+
+            if dispatch_wait in done:
+                done.discard(dispatch_wait)
+                dispatch_wait = None
+                hedge_at = time.monotonic() + hedge_delay
+
+            for task in done:
+                attempts.discard(task)
+                if task.exception() is None:
+                    if tracker is not None and task is not first:
+                        tracker.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+
+            if hedge_at is not None and time.monotonic() >= hedge_at and attempts:
+                hedge_at = None
+                if can_hedge is None or can_hedge():
+                    attempts.add(asyncio.create_task(call(None)))
+                    if tracker is not None:
+                        tracker.hedges += 1
+        raise error
+    finally:
+        for task in attempts:
+            task.cancel()
+        if dispatch_wait is not None:
+            dispatch_wait.cancel()
@@ -0,0 +1,183 @@
+"""
+Per-stage model routing.
+
+Each stage lists candidate models from cheapest/weakest to strongest. For a
+call the router picks the first candidate that
+
+- fits the prompt plus max_tokens in its context window,
+- stays within the stage's cost budget for this prompt size,
+- has an observed p95 latency within the stage's latency budget, and
+- is not cooling down after a high error rate.
+
+When no candidate qualifies the strongest model that fits is used. A response
+that fails validation escalates to the next stronger candidate. Every call is
+recorded for the per-model latency/cost report at /api/metrics/upstream.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.deadline import LatencyTracker
+
+# Rolling window of call outcomes used for the error rate
+OUTCOME_WINDOW = 50
+MIN_OUTCOMES = 10
+MODEL_MAX_ERROR_RATE = float(os.getenv("MODEL_MAX_ERROR_RATE", "0.5"))
+MODEL_COOLDOWN_SECONDS = float(os.getenv("MODEL_COOLDOWN_SECONDS", "30"))
+
+class ModelSpec(NamedTuple):
+    # USD per 1K tokens
+    input_cost_per_1k: float
+    output_cost_per_1k: float
+    context_tokens: int
+
+MODEL_CATALOG: Dict[str, ModelSpec] = {
+    "gpt-4o-mini": ModelSpec(0.00015, 0.0006, 128000),
+    "gpt-4o": ModelSpec(0.0025, 0.01, 128000),
+    "gpt-4-turbo": ModelSpec(0.01, 0.03, 128000),
+    "gpt-4": ModelSpec(0.03, 0.06, 8192),
+    "gpt-3.5-turbo": ModelSpec(0.0005, 0.0015, 16385),
+}
+# Extra or overridden models, e.g. {"llama3": [0, 0, 8192]}
+MODEL_CATALOG.update({
+    name: ModelSpec(*spec) for name, spec in json.loads(os.getenv("MODEL_CATALOG", "{}")).items()
+})
+
+class StageRoute(NamedTuple):
+    models: List[str]
+    latency_budget_ms: float
+    cost_budget_usd: float
+
+def _stage_route(stage: str, models: str, latency_budget_ms: str, cost_budget_usd: str) -> StageRoute:
+    prefix = stage.upper()
+    return StageRoute(
+        models=[model.strip() for model in os.getenv(f"{prefix}_MODELS", models).split(",") if model.strip()],
+        latency_budget_ms=float(os.getenv(f"{prefix}_LATENCY_BUDGET_MS", latency_budget_ms)),
+        cost_budget_usd=float(os.getenv(f"{prefix}_COST_BUDGET_USD", cost_budget_usd)),
+    )
+
+STAGE_ROUTES = {
+    # Structured extraction at low temperature is well within a small model's reach
+    "extraction": _stage_route("extraction", "gpt-4o-mini,gpt-4o,gpt-4", "10000", "0.02"),
+    "analysis": _stage_route("analysis", "gpt-4o,gpt-4", "45000", "0.25"),
+}
+
+def estimate_prompt_tokens(messages: list) -> int:
+    """~4 characters per token."""
+    return sum(len(message["content"]) for message in messages) // 4
+
+def _spec(model: str) -> ModelSpec:
+    # Unknown models are assumed free with a conservative context window
+    return MODEL_CATALOG.get(model, ModelSpec(0.0, 0.0, 8192))
+
+class ModelStats:
+    """Latency, outcomes and spend of one model in one stage."""
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self._outcomes = deque(maxlen=OUTCOME_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.invalid = 0
+        self.escalations = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.disabled_until = 0.0
+
+    def error_rate(self) -> Optional[float]:
+        if len(self._outcomes) < MIN_OUTCOMES:
+            return None
+        return self._outcomes.count(False) / len(self._outcomes)
+
+class ModelRouter:
+    def __init__(self, routes: Dict[str, StageRoute] = STAGE_ROUTES):
+        self.routes = routes
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, stage: str, model: str) -> ModelStats:
+        with self._lock:
+            return self._stats.setdefault((stage, model), ModelStats())
+
+    def _fits(self, model: str, prompt_tokens: int, max_tokens: int) -> bool:
+        return prompt_tokens + max_tokens <= _spec(model).context_tokens
+
+    def estimate_cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        spec = _spec(model)
+        return (prompt_tokens * spec.input_cost_per_1k + completion_tokens * spec.output_cost_per_1k) / 1000
+
+    def choose(self, stage: str, prompt_tokens: int, max_tokens: int) -> str:
+        """Cheapest candidate within the stage's budgets; the strongest model that fits otherwise."""
+        route = self.routes[stage]
+        fitting = [model for model in route.models if self._fits(model, prompt_tokens, max_tokens)] or route.models[-1:]
+        now = time.time()
+        for model in fitting:
+            stats = self.stats(stage, model)
+            if stats.disabled_until > now:
+                continue
+            if self.estimate_cost(model, prompt_tokens, max_tokens) > route.cost_budget_usd:
+                continue
+            p95 = stats.latency.percentile(95)
+            if p95 is not None and p95 * 1000 > route.latency_budget_ms:
+                continue
+            return model
+        return fitting[-1]
+
+    def escalate(self, stage: str, model: str, prompt_tokens: int, max_tokens: int) -> Optional[str]:
+        """Next stronger candidate that fits the prompt, or None if `model` is already the strongest."""
+        route = self.routes[stage]
+        stronger = route.models[route.models.index(model) + 1:] if model in route.models else []
+        for candidate in stronger:
+            if self._fits(candidate, prompt_tokens, max_tokens):
+                self.stats(stage, model).escalations += 1
+                return candidate
+        return None
+
+    def record(self, stage: str, model: str, usage: Any = None, failure: Optional[str] = None):
+        """Record a finished call: failure is None, "invalid" (failed validation) or "error"."""
+        stats = self.stats(stage, model)
+        with self._lock:
+            stats.calls += 1
+            stats._outcomes.append(failure is None)
+            if failure == "invalid":
+                stats.invalid += 1
+            elif failure == "error":
+                stats.errors += 1
+            if usage is not None:
+                stats.prompt_tokens += usage.prompt_tokens or 0
+                stats.completion_tokens += usage.completion_tokens or 0
+                stats.cost_usd += self.estimate_cost(model, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+
+            error_rate = stats.error_rate()
+            if error_rate is not None and error_rate > MODEL_MAX_ERROR_RATE:
+                # Skip the model for a while, then give it a fresh window
+                stats.disabled_until = time.time() + MODEL_COOLDOWN_SECONDS
+                stats._outcomes.clear()
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage and model: calls, failures, latency percentiles, tokens and spend."""
+        report: Dict[str, Dict[str, Any]] = {stage: {} for stage in self.routes}
+        with self._lock:
+            items = list(self._stats.items())
+        for (stage, model), stats in items:
+            report.setdefault(stage, {})[model] = {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "invalid": stats.invalid,
+                "escalations": stats.escalations,
+                "error_rate": stats.error_rate(),
+                "cooling_down": stats.disabled_until > time.time(),
+                **stats.latency.snapshot(),
+                "prompt_tokens": stats.prompt_tokens,
+                "completion_tokens": stats.completion_tokens,
+                "cost_usd": round(stats.cost_usd, 6),
+                "avg_cost_usd": round(stats.cost_usd / stats.calls, 6) if stats.calls else None,
+            }
+        return report
+
+model_router = ModelRouter()
@@ -1,4 +1,4 @@
-from app.schemas import Industry
+from app.schemas import Analysis, Industry
 from app.constants import (
     get_industry_base_salary,
     get_industry_complexity_multiplier,
@@ -8,15 +8,171 @@ from app.constants import (
     JOB_LEVEL_MULTIPLIERS,
     LOCATION_MULTIPLIERS
 )
-from openai import AsyncOpenAI
+from app.deadline import (
+    ANALYZE_DEADLINE_SECONDS,
+    DEADLINE_RESERVE_SECONDS,
+    EXTRACTION_BUDGET_SHARE,
+    MIN_ATTEMPT_SECONDS,
+    Deadline,
+    hedged
+)
+from app.model_router import estimate_prompt_tokens, model_router
+from app.rate_limit import acquire_openai_budget
+from app.scheduler import Priority, QuotaExceeded, upstream_scheduler
+import asyncio
 import json
 import os
 import re
-from typing import Dict, Any, Optional, Tuple
+import time
+from typing import Dict, Any, Callable, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_client = None
+
+def get_openai_client():
+    """
+    Return the shared AsyncOpenAI client, importing openai on first use.
+    Reusing one client keeps its HTTP connection pool warm between requests.
+    """
+    global _client
+    if _client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        # API key from the environment; the client also honours OPENAI_BASE_URL, e.g. to
+        # target a compatible server such as benchmarks/openai_stub.py.
+        # complete_json() owns retries and timeouts, so the SDK must not retry behind its back
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(proxies=None),
+            max_retries=0
+        )
+    return _client
+
+def _retryable(error: Exception) -> bool:
+    """Timeouts, bad JSON, rate limits and server errors are worth retrying; other 4xx are not."""
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code in (408, 409, 429) or status_code >= 500
+
+def validate_extraction(data: Any) -> Dict[str, Any]:
+    if not isinstance(data, dict) or "job_title" not in data:
+        raise ValueError("Extraction is not a JSON object with a job_title")
+    return data
+
+def validate_analysis(data: Any) -> Analysis:
+    # Raises pydantic.ValidationError (a ValueError) when fields are missing or mistyped.
+    # The only validation of a successful analysis: post-processing edits and serializes this instance
+    return Analysis.model_validate(data)
+
+def serialize_analysis(analysis: Analysis, **extra: Any) -> Tuple[Dict[str, Any], bytes]:
+    """(analysis_data, analysis_json): the analysis as a dict with `extra` keys added, and as JSON bytes."""
+    analysis_data = analysis.model_dump()
+    analysis_data.update(extra)
+    return analysis_data, analysis.model_dump_json().encode()
+
+async def complete_json(
+    stage: str,
+    messages: list,
+    temperature: float,
+    max_tokens: int,
+    priority: Priority,
+    tenant: Optional[str],
+    deadline: Deadline,
+    validate: Callable[[Any], Any]
+) -> Any:
+    """
+    Run a stage's chat completion on the routed model and return validate(parsed JSON) before `deadline`.
+    Output that fails validation escalates to the next stronger model, and is retried once on the
+    strongest before the error is raised; other retryable failures are re-routed. Retries back off.
+    Interactive calls are hedged once the model has enough latency samples and has
+    been in flight, not queued, for longer than its hedge delay. Attempts continue while at
+    least MIN_ATTEMPT_SECONDS remain; after that the last error is raised.
+    """
+    client = get_openai_client()
+    prompt_tokens = estimate_prompt_tokens(messages)
+    model = model_router.choose(stage, prompt_tokens, max_tokens)
+
+    backoff = 0.5
+    # Once output has failed validation, retries stay on models at least as strong as the current one
+    escalated = False
+    retried_strongest = False
+    while True:
+        stats = model_router.stats(stage, model)
+
+        async def timed_create(dispatched: Optional[asyncio.Event], model=model, stats=stats):
+            if dispatched is not None:
+                dispatched.set()
+            started = time.monotonic()
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=deadline.remaining()
+                )
+            except asyncio.CancelledError:
+                # Timed out or beaten by a hedge: the call was at least this slow. Dropping it would
+                # bias the percentiles (and hedge delay) towards fast calls. A cancelled hedge says
+                # nothing the first attempt's sample doesn't, so only first attempts are recorded.
+                if dispatched is not None:
+                    stats.latency.record(time.monotonic() - started)
+                    if deadline.expired:
+                        model_router.record(stage, model, failure="error")
+                raise
+            except Exception:
+                # Recorded per upstream attempt, so errors behind a winning hedge still count
+                model_router.record(stage, model, failure="error")
+                raise
+            stats.latency.record(time.monotonic() - started)
+            return response
+
+        async def attempt(dispatched: Optional[asyncio.Event], timed_create=timed_create):
+            await acquire_openai_budget(prompt_tokens, max_tokens=max_tokens)
+            return await upstream_scheduler.run(priority, tenant, lambda: timed_create(dispatched))
+
+        hedge_delay = stats.latency.hedge_delay() if priority == Priority.INTERACTIVE else None
+        try:
+            response = await hedged(
+                attempt, deadline.remaining(), hedge_delay, stats.latency, upstream_scheduler.has_idle_slot
+            )
+            text = response.choices[0].message.content.strip()
+            print(f"Raw {stage} response ({model}): {text}")
+            try:
+                result = validate(json.loads(text))
+            except ValueError:
+                model_router.record(stage, model, response.usage, failure="invalid")
+                raise
+            model_router.record(stage, model, response.usage)
+            return result
+        except QuotaExceeded:
+            raise
+        except ValueError as e:
+            # Bad output: a stronger model is more likely to get it right
+            if deadline.remaining() < MIN_ATTEMPT_SECONDS + backoff:
+                raise
+            stronger = model_router.escalate(stage, model, prompt_tokens, max_tokens)
+            if stronger is None:
+                if retried_strongest:
+                    # The strongest model failed twice; the caller falls back
+                    raise
+                retried_strongest = True
+            escalated = True
+            print(f"{model} output failed {stage} validation ({e}), retrying on {stronger or model}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 4)
+            model = stronger or model
+        except Exception as e:
+            if not _retryable(e) or deadline.remaining() < MIN_ATTEMPT_SECONDS + backoff:
+                raise
+            print(f"{stage} attempt on {model} failed ({e!r}), retrying with {deadline.remaining():.1f}s left")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 4)
+            if not escalated:
+                model = model_router.choose(stage, prompt_tokens, max_tokens)
+
 def extract_job_data_prompt(job_description: str) -> str:
     return f"""
 Extract the following specific information from this job description. Return ONLY a JSON object with these fields:
@@ -145,35 +301,38 @@ Guidelines:
 Return ONLY the JSON response, no additional text.
 """
 
-async def extract_job_data(job_description: str) -> Dict[str, Any]:
-    """Extract structured data from job description using AI."""
+async def extract_job_data(
+    job_description: str,
+    priority: Priority = Priority.INTERACTIVE,
+    tenant: Optional[str] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """Extract structured data from job description using AI, giving up with defaults at the deadline."""
+    if deadline is None:
+        deadline = Deadline(ANALYZE_DEADLINE_SECONDS * EXTRACTION_BUDGET_SHARE)
     try:
-        # Initialize client with only API key
-        import httpx
-        client = AsyncOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            http_client=httpx.AsyncClient(proxies=None)
-        )
-        
         extraction_prompt = extract_job_data_prompt(job_description)
         
-        response = await client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a data extraction specialist. Extract job information accurately and return only valid JSON."},
-                {"role": "user", "content": extraction_prompt}
-            ],
+        messages = [
+            {"role": "system", "content": "You are a data extraction specialist. Extract job information accurately and return only valid JSON."},
+            {"role": "user", "content": extraction_prompt}
+        ]
+        extracted_data = await complete_json(
+            "extraction",
+            messages,
             temperature=0.1,  # Lower temperature for more consistent extraction
-            max_tokens=1000
+            max_tokens=1000,
+            priority=priority,
+            tenant=tenant,
+            deadline=deadline,
+            validate=validate_extraction
         )
-        
-        extracted_text = response.choices[0].message.content.strip()
-        print(f"Raw extraction response: {extracted_text}")
-        extracted_data = json.loads(extracted_text)
         print(f"Parsed extraction data: {json.dumps(extracted_data, indent=2)}")
         
         return extracted_data
         
+    except QuotaExceeded:
+        raise
     except Exception as e:
         print(f"Error extracting job data: {e}")
         # Return default structure if extraction fails
@@ -266,10 +425,29 @@ def calculate_realistic_salary(extracted_data: Dict[str, Any], industry: str) ->
     print(f"Estimated salary from industry data: ${estimated_salary:,}")
     return estimated_salary
 
-async def analyze_job_description(job_description: str, industry: str) -> Dict[str, Any]:
+async def analyze_job_description(
+    job_description: str,
+    industry: str,
+    priority: Priority = Priority.INTERACTIVE,
+    tenant: Optional[str] = None,
+    deadline: Optional[Deadline] = None
+) -> Tuple[Dict[str, Any], bytes]:
+    """
+    Run both OpenAI stages; priority and tenant decide their place in the upstream scheduler.
+    Each stage's timeout comes from what is left of `deadline`; the fallback analysis is only
+    used once the deadline is exhausted (or on an error retrying can't fix).
+    Returns (analysis_data, analysis_json) from serialize_analysis; the Analysis is validated once.
+    """
+    if deadline is None:
+        deadline = Deadline(ANALYZE_DEADLINE_SECONDS)
     try:
         # First, extract structured data from the job description
-        extracted_data = await extract_job_data(job_description)
+        extracted_data = await extract_job_data(
+            job_description,
+            priority,
+            tenant,
+            deadline.stage(EXTRACTION_BUDGET_SHARE, reserve=DEADLINE_RESERVE_SECONDS)
+        )
         print("Extracted job data:", json.dumps(extracted_data, indent=2))
         
         # Calculate realistic salary based on extracted data
@@ -280,92 +458,93 @@ async def analyze_job_description(job_description: str, industry: str) -> Dict[s
         prompt = create_analysis_prompt(job_description, industry, extracted_data)
         print(f"Analysis prompt being sent to OpenAI: {prompt[:1000]}...")
         
-        # Initialize client with only API key
-        import httpx
-        client = AsyncOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            http_client=httpx.AsyncClient(proxies=None)
-        )
-        response = await client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert AI automation consultant. Respond only with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
+        messages = [
+            {"role": "system", "content": "You are an expert AI automation consultant. Respond only with valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+        analysis = await complete_json(
+            "analysis",
+            messages,
             temperature=0.7,
-            max_tokens=2000
+            max_tokens=2000,
+            priority=priority,
+            tenant=tenant,
+            deadline=deadline.stage(reserve=DEADLINE_RESERVE_SECONDS),
+            validate=validate_analysis
         )
         
-        analysis_text = response.choices[0].message.content.strip()
-        print("AI Analysis:", analysis_text)
-        
-        # Parse JSON response
-        analysis = json.loads(analysis_text)
-        
         # Use industry-specific data for calculations
         complexity_multiplier = get_industry_complexity_multiplier(industry)
         productivity_range = get_industry_productivity_range(industry)
         implementation_costs = get_industry_implementation_costs(industry)
         
         # Update ROI analysis with realistic salary and industry-specific costs
-        roi = analysis["roi_analysis"]
-        roi["current_annual_cost"] = realistic_salary
+        roi = analysis.roi_analysis
+        roi.current_annual_cost = realistic_salary
         
         # Use industry-specific implementation costs
         min_cost, max_cost = implementation_costs
         implementation_cost = int(min_cost + (max_cost - min_cost) * complexity_multiplier * 0.5)
-        roi["automation_implementation_cost"] = implementation_cost
+        roi.automation_implementation_cost = implementation_cost
         
         # Recalculate savings based on realistic data
         # Annual savings = realistic_salary * average productivity improvement for industry
         avg_productivity = sum(productivity_range) / 2
         annual_savings = int(realistic_salary * avg_productivity)
         
-        roi["annual_savings"] = annual_savings
-        roi["net_savings_year_1"] = annual_savings - implementation_cost
-        roi["net_savings_year_3"] = (annual_savings * 3) - implementation_cost
-        roi["roi_percentage"] = int(((annual_savings - implementation_cost) / implementation_cost) * 100) if implementation_cost > 0 else 0
+        roi.annual_savings = annual_savings
+        roi.net_savings_year_1 = annual_savings - implementation_cost
+        roi.net_savings_year_3 = (annual_savings * 3) - implementation_cost
+        roi.roi_percentage = int(((annual_savings - implementation_cost) / implementation_cost) * 100) if implementation_cost > 0 else 0
         
         # Update executive summary with recalculated values
-        analysis["executive_summary"]["total_annual_savings"] = annual_savings
+        analysis.executive_summary.total_annual_savings = annual_savings
         
         # Update task breakdown with proportional savings
-        total_task_savings = sum(task["estimated_annual_savings"] for task in analysis["task_breakdown"])
+        total_task_savings = sum(task.estimated_annual_savings for task in analysis.task_breakdown)
         print(f"Original total task savings from OpenAI: ${total_task_savings:,}")
         print(f"Calculated annual savings to distribute: ${annual_savings:,}")
         
         if total_task_savings > 0:
-            for task in analysis["task_breakdown"]:
+            for task in analysis.task_breakdown:
                 # Proportionally distribute the realistic annual savings across tasks
-                original_savings = task["estimated_annual_savings"]
-                task_proportion = task["estimated_annual_savings"] / total_task_savings
+                original_savings = task.estimated_annual_savings
+                task_proportion = task.estimated_annual_savings / total_task_savings
                 new_savings = int(annual_savings * task_proportion)
-                task["estimated_annual_savings"] = new_savings
-                print(f"Task '{task['task_name']}': ${original_savings:,} -> ${new_savings:,}")
+                task.estimated_annual_savings = new_savings
+                print(f"Task '{task.task_name}': ${original_savings:,} -> ${new_savings:,}")
         else:
             print("No task savings to redistribute - keeping OpenAI original values")
         
         # Update implementation roadmap with realistic costs
-        total_roadmap_savings = sum(phase["estimated_savings"] for phase in analysis["implementation_roadmap"])
+        total_roadmap_savings = sum(phase.estimated_savings for phase in analysis.implementation_roadmap)
         if total_roadmap_savings > 0:
-            for phase in analysis["implementation_roadmap"]:
+            for phase in analysis.implementation_roadmap:
                 # Proportionally distribute savings across phases
-                phase_proportion = phase["estimated_savings"] / total_roadmap_savings
-                phase["estimated_savings"] = int(annual_savings * phase_proportion)
+                phase_proportion = phase.estimated_savings / total_roadmap_savings
+                phase.estimated_savings = int(annual_savings * phase_proportion)
         
         # Add extracted data to the response for transparency
-        analysis["extracted_job_data"] = extracted_data
-        
-        return analysis
+        return serialize_analysis(analysis, extracted_job_data=extracted_data)
         
+    except QuotaExceeded:
+        raise
+    except asyncio.TimeoutError:
+        print("Analysis deadline exhausted after retries")
+        return fallback_result(job_description, industry)
     except json.JSONDecodeError as e:
         print(f"JSON parsing error: {e}")
-        # Fallback to basic analysis if JSON parsing fails
-        return create_fallback_analysis(job_description, industry)
+        # Fallback to basic analysis if JSON parsing still fails when the deadline runs out
+        return fallback_result(job_description, industry)
     except Exception as e:
         print(f"Analysis error: {e}")
         # Fallback for any other errors
-        return create_fallback_analysis(job_description, industry)
+        return fallback_result(job_description, industry)
+
+def fallback_result(job_description: str, industry: str) -> Tuple[Dict[str, Any], bytes]:
+    """The fallback analysis as (analysis_data, analysis_json), like analyze_job_description returns."""
+    analysis_data = create_fallback_analysis(job_description, industry)
+    return serialize_analysis(Analysis.model_validate(analysis_data), is_fallback=True)
 
 def create_fallback_analysis(job_description: str, industry: str) -> Dict[str, Any]:
     """Create a basic analysis when OpenAI analysis fails"""
@@ -457,5 +636,6 @@ def create_fallback_analysis(job_description: str, industry: str) -> Dict[str, A
                 "estimated_savings": int(annual_savings * 0.7),
                 "complexity": "Medium"
             }
-        ]
+        ],
+        "is_fallback": True
     }
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Database connection pool configuration and metrics.
+
+Pool sizing is read from the environment. When DB_MAX_CONNECTIONS is set it is
+treated as the connection budget for the whole instance and divided between
+the uvicorn workers (WEB_CONCURRENCY), so adding workers never exceeds
+Postgres' max_connections.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Recent checkout waits kept for percentile reporting
+WAIT_SAMPLE_SIZE = 1000
+
+def pool_settings() -> Dict[str, Any]:
+    """create_engine() keyword arguments for the connection pool."""
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    max_connections = os.getenv("DB_MAX_CONNECTIONS")
+
+    if max_connections:
+        # Hard per-worker cap: no overflow beyond this worker's share of the budget
+        per_worker = max(1, int(max_connections) // workers)
+        default_pool_size, default_max_overflow = per_worker, 0
+    else:
+        default_pool_size, default_max_overflow = 5, 10
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", default_pool_size)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", default_max_overflow)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        # Recycle before typical proxy/server idle timeouts drop the connection
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+
+class PoolMetrics:
+    """Checkout wait times and timeouts, shared by every pool in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self._waits.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.total_wait_seconds / self.checkouts * 1000 if self.checkouts else 0.0,
+                "p95_wait_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+def pool_status(pool) -> Dict[str, Any]:
+    """Current utilization of a pool plus the process-wide checkout wait metrics."""
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(0, pool._max_overflow)
+        status.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "utilization": pool.checkedout() / capacity if capacity > 0 else 0.0,
+        })
+    status.update(pool_metrics.snapshot())
+    return status
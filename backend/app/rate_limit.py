@@ -0,0 +1,57 @@
+"""
+Upstream rate budgets shared by every worker.
+
+Counters live in the shared-state backend, so with SHARED_STATE_BACKEND=sqlite
+or database the OpenAI per-minute limits are enforced for the whole deployment
+rather than once per process.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+
+from app.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+# 0 disables a budget
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "0"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+
+class RateBudget:
+    """Fixed-window budget: at most `limit` units per `window` seconds across all workers."""
+
+    def __init__(self, name: str, limit: int, window: float = 60.0):
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    async def acquire(self, amount: int = 1):
+        """Wait until `amount` units fit in the current window, then consume them."""
+        if self.limit <= 0:
+            return
+        state = get_shared_state()
+        while True:
+            now = time.time()
+            window_index = int(now // self.window)
+            key = f"rate:{self.name}:{window_index}"
+            count = await asyncio.to_thread(state.incr, key, amount, self.window * 2)
+            if count <= self.limit or amount > self.limit:
+                # A single request larger than the whole budget is let through rather than blocked forever
+                return
+            # Over budget: give the units back and retry in the next window
+            await asyncio.to_thread(state.incr, key, -amount, self.window * 2)
+            delay = (window_index + 1) * self.window - now
+            logger.info(f"Rate budget {self.name} exhausted, waiting {delay:.1f}s")
+            # Jitter so waiting workers don't all retry at the window boundary
+            await asyncio.sleep(delay + random.uniform(0, 0.25))
+
+openai_request_budget = RateBudget("openai-requests", OPENAI_REQUESTS_PER_MINUTE)
+openai_token_budget = RateBudget("openai-tokens", OPENAI_TOKENS_PER_MINUTE)
+
+async def acquire_openai_budget(prompt_tokens: int, max_tokens: int):
+    """Reserve request and token budget for one chat completion; prompt_tokens is the router's estimate."""
+    await openai_request_budget.acquire()
+    await openai_token_budget.acquire(prompt_tokens + max_tokens)
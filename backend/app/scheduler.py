@@ -0,0 +1,265 @@
+"""
+Priority scheduling of upstream OpenAI calls.
+
+Every chat completion runs through upstream_scheduler, which caps concurrent
+calls per process and decides who goes next:
+
+- Three queues - interactive (/api/analyze), recompute and bulk - share the
+  slots by weight (stride scheduling), so no queue starves.
+- Within a queue tenants (user_email, else session_id) take turns, each limited
+  to TENANT_MAX_CONCURRENCY running calls and TENANT_MAX_QUEUED waiting ones.
+- Background work (recompute + bulk) never holds more than
+  SCHEDULER_BACKGROUND_SHARE of the slots, so interactive arrivals find headroom.
+- When interactive calls wait longer than INTERACTIVE_PREEMPT_AFTER_MS, or their
+  recent p95 queue wait exceeds INTERACTIVE_QUEUE_SLO_MS, background dispatch
+  pauses and running background calls are cancelled and requeued.
+
+Slots are per process; the global request/token budgets are in app.rate_limit.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+TENANT_MAX_CONCURRENCY = int(os.getenv("TENANT_MAX_CONCURRENCY", "2"))
+TENANT_MAX_QUEUED = int(os.getenv("TENANT_MAX_QUEUED", "20"))
+SCHEDULER_BACKGROUND_SHARE = float(os.getenv("SCHEDULER_BACKGROUND_SHARE", "0.5"))
+INTERACTIVE_QUEUE_SLO_MS = float(os.getenv("INTERACTIVE_QUEUE_SLO_MS", "500"))
+INTERACTIVE_PREEMPT_AFTER_MS = float(os.getenv("INTERACTIVE_PREEMPT_AFTER_MS", "250"))
+
+# Recent queue waits kept per queue; only the last PRESSURE_WINDOW seconds count towards the SLO check
+WAIT_SAMPLE_SIZE = 500
+PRESSURE_WINDOW = 30
+# Seconds between dispatch attempts while background work is paused
+BACKGROUND_RETRY_INTERVAL = 1.0
+
+class Priority(str, Enum):
+    INTERACTIVE = "interactive"
+    RECOMPUTE = "recompute"
+    BULK = "bulk"
+
+DEFAULT_WEIGHTS = {Priority.INTERACTIVE: 8, Priority.RECOMPUTE: 2, Priority.BULK: 1}
+
+# Preempted youngest-first, bulk before recompute
+BACKGROUND = (Priority.BULK, Priority.RECOMPUTE)
+
+class QuotaExceeded(Exception):
+    """The tenant already has TENANT_MAX_QUEUED calls waiting."""
+
+class _Ticket:
+    def __init__(self, priority: Priority, tenant: str):
+        self.priority = priority
+        self.tenant = tenant
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.task = asyncio.current_task()
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.preempted = False
+
+class UpstreamScheduler:
+    def __init__(
+        self,
+        capacity: int = OPENAI_MAX_CONCURRENCY,
+        weights: Dict[Priority, int] = DEFAULT_WEIGHTS,
+        tenant_concurrency: int = TENANT_MAX_CONCURRENCY,
+        tenant_queue_limit: int = TENANT_MAX_QUEUED,
+        background_share: float = SCHEDULER_BACKGROUND_SHARE,
+        interactive_slo_ms: float = INTERACTIVE_QUEUE_SLO_MS,
+        preempt_after_ms: float = INTERACTIVE_PREEMPT_AFTER_MS
+    ):
+        self.capacity = capacity
+        self.weights = weights
+        self.tenant_concurrency = tenant_concurrency
+        self.tenant_queue_limit = tenant_queue_limit
+        self.background_limit = max(1, int(capacity * background_share))
+        self.interactive_slo = interactive_slo_ms / 1000
+        self.preempt_after = preempt_after_ms / 1000
+
+        # Per queue: tenants in round-robin order, each with its waiting tickets
+        self.queues: Dict[Priority, "OrderedDict[str, Deque[_Ticket]]"] = {p: OrderedDict() for p in Priority}
+        self.running: List[_Ticket] = []
+        self._tenant_running: Counter = Counter()
+        self._tenant_queued: Counter = Counter()
+        # Stride scheduling: the queue with the lowest pass goes next and advances by 1/weight
+        self._pass = {p: 0.0 for p in Priority}
+        self._virtual_time = 0.0
+        self._waits: Dict[Priority, Deque] = {p: deque(maxlen=WAIT_SAMPLE_SIZE) for p in Priority}
+        self.preemptions = 0
+        self._retry_scheduled = False
+
+    async def run(self, priority: Priority, tenant: Optional[str], call: Callable[[], Awaitable[Any]]) -> Any:
+        """Wait for a slot, then await call(). Preempted background calls are requeued and retried."""
+        tenant = tenant or "anonymous"
+        while True:
+            ticket = self._enqueue(priority, tenant)
+            try:
+                await ticket.future
+                return await call()
+            except asyncio.CancelledError:
+                if not ticket.preempted:
+                    raise
+                # Our own cancellation: clear it and go back in the queue
+                if hasattr(ticket.task, "uncancel"):
+                    ticket.task.uncancel()
+                logger.info(f"Preempted {priority.value} call for {tenant}, requeueing")
+            finally:
+                self._release(ticket)
+
+    def _enqueue(self, priority: Priority, tenant: str) -> _Ticket:
+        if self._tenant_queued[tenant] >= self.tenant_queue_limit:
+            raise QuotaExceeded(f"Too many queued analyses for {tenant}")
+        ticket = _Ticket(priority, tenant)
+
+        tenants = self.queues[priority]
+        if not tenants:
+            # A queue returning from idle must not bank credit for the time it had no work
+            self._pass[priority] = max(self._pass[priority], self._virtual_time)
+        tenants.setdefault(tenant, deque()).append(ticket)
+        self._tenant_queued[tenant] += 1
+
+        self._dispatch()
+        if priority == Priority.INTERACTIVE and not ticket.future.done():
+            asyncio.get_running_loop().call_later(self.preempt_after, self._preempt_for, ticket)
+        return ticket
+
+    def _release(self, ticket: _Ticket):
+        if ticket.started_at is not None:
+            if ticket in self.running:
+                self.running.remove(ticket)
+                self._decrement(self._tenant_running, ticket.tenant)
+        else:
+            # Cancelled while waiting
+            tenants = self.queues[ticket.priority]
+            waiting = tenants.get(ticket.tenant)
+            if waiting is not None and ticket in waiting:
+                waiting.remove(ticket)
+                self._decrement(self._tenant_queued, ticket.tenant)
+                if not waiting:
+                    del tenants[ticket.tenant]
+        self._dispatch()
+
+    @staticmethod
+    def _decrement(counter: Counter, tenant: str):
+        # Drop zero entries so idle tenants don't accumulate
+        counter[tenant] -= 1
+        if counter[tenant] <= 0:
+            del counter[tenant]
+
+    def _dispatch(self):
+        while len(self.running) < self.capacity:
+            ticket = self._next_ticket()
+            if ticket is None:
+                self._schedule_background_retry()
+                return
+            ticket.started_at = time.monotonic()
+            self.running.append(ticket)
+            self._tenant_running[ticket.tenant] += 1
+            self._waits[ticket.priority].append((ticket.started_at, ticket.started_at - ticket.enqueued_at))
+            ticket.future.set_result(None)
+
+    def _schedule_background_retry(self):
+        """A pause in background dispatch ends with time, not an event, so check again shortly."""
+        if self._retry_scheduled or not any(self.queues[priority] for priority in BACKGROUND):
+            return
+        self._retry_scheduled = True
+
+        def retry():
+            self._retry_scheduled = False
+            self._dispatch()
+
+        asyncio.get_running_loop().call_later(BACKGROUND_RETRY_INTERVAL, retry)
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        background_running = sum(1 for ticket in self.running if ticket.priority in BACKGROUND)
+        background_open = background_running < self.background_limit and not self.interactive_under_pressure()
+
+        best = None
+        for order, priority in enumerate(Priority):
+            if priority in BACKGROUND and not background_open:
+                continue
+            tenant = self._eligible_tenant(priority)
+            if tenant is None:
+                continue
+            candidate = (self._pass[priority], order, priority, tenant)
+            if best is None or candidate < best:
+                best = candidate
+        if best is None:
+            return None
+
+        _, _, priority, tenant = best
+        self._virtual_time = self._pass[priority]
+        self._pass[priority] += 1 / self.weights[priority]
+
+        tenants = self.queues[priority]
+        waiting = tenants[tenant]
+        ticket = waiting.popleft()
+        self._decrement(self._tenant_queued, tenant)
+        if waiting:
+            tenants.move_to_end(tenant)
+        else:
+            del tenants[tenant]
+        return ticket
+
+    def _eligible_tenant(self, priority: Priority) -> Optional[str]:
+        """First tenant in round-robin order that is below its concurrency quota."""
+        for tenant in self.queues[priority]:
+            if self._tenant_running[tenant] < self.tenant_concurrency:
+                return tenant
+        return None
+
+    def has_idle_slot(self) -> bool:
+        """True when a call enqueued now would be dispatched at once, e.g. to decide whether to hedge."""
+        return len(self.running) < self.capacity and not any(self.queues[Priority.INTERACTIVE].values())
+
+    def interactive_under_pressure(self) -> bool:
+        """True while interactive calls are waiting too long; background dispatch pauses meanwhile."""
+        now = time.monotonic()
+        for waiting in self.queues[Priority.INTERACTIVE].values():
+            if waiting and now - waiting[0].enqueued_at > self.preempt_after:
+                return True
+        recent = sorted(wait for started_at, wait in self._waits[Priority.INTERACTIVE] if now - started_at < PRESSURE_WINDOW)
+        return bool(recent) and recent[int(len(recent) * 0.95)] > self.interactive_slo
+
+    def _preempt_for(self, ticket: _Ticket):
+        """Free a slot for an interactive ticket that has waited too long by cancelling background work."""
+        if ticket.future.done() or ticket.task is None or ticket.task.done():
+            return
+        if len(self.running) < self.capacity or self._tenant_running[ticket.tenant] >= self.tenant_concurrency:
+            # Either a slot is free already or the ticket is held back by its own tenant quota
+            return
+        for priority in BACKGROUND:
+            victims = [running for running in self.running if running.priority == priority and not running.preempted]
+            if victims:
+                victim = max(victims, key=lambda running: running.started_at)
+                victim.preempted = True
+                victim.task.cancel()
+                self.preemptions += 1
+                return
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue depths, running calls and queue wait percentiles for monitoring."""
+        queues = {}
+        for priority in Priority:
+            waits = sorted(wait for _, wait in self._waits[priority])
+            queues[priority.value] = {
+                "queued": sum(len(waiting) for waiting in self.queues[priority].values()),
+                "running": sum(1 for ticket in self.running if ticket.priority == priority),
+                "p50_wait_ms": waits[len(waits) // 2] * 1000 if waits else 0.0,
+                "p95_wait_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+            }
+        return {
+            "capacity": self.capacity,
+            "background_limit": self.background_limit,
+            "background_paused": self.interactive_under_pressure(),
+            "preemptions": self.preemptions,
+            "queues": queues,
+        }
+
+upstream_scheduler = UpstreamScheduler()
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from datetime import date, datetime
 from enum import Enum
 
 class Industry(str, Enum):
@@ -21,6 +22,14 @@ class AnalyzeRequest(BaseModel):
     industry: Industry
     session_id: Optional[str] = None
 
+class BulkAnalyzeRequest(BaseModel):
+    items: List[AnalyzeRequest] = Field(..., min_length=1, max_length=100)
+
+class BackgroundAnalysisResponse(BaseModel):
+    """Work accepted for background analysis; fetch results via /api/analysis/session/{session_id}."""
+    accepted: int
+    session_ids: List[str]
+
 class TaskBreakdown(BaseModel):
     task_name: str
     description: str
@@ -65,4 +74,50 @@ class Analysis(BaseModel):
 
 class AnalyzeResponse(BaseModel):
     id: int
-    analysis: Analysis
\ No newline at end of file
+    analysis: Analysis
+
+class StoredAnalysisMetadata(BaseModel):
+    id: int
+    session_id: Optional[str] = None
+    industry: str
+    job_title: Optional[str] = None
+    job_description: str
+    created_at: datetime
+
+class StoredAnalysisResponse(StoredAnalysisMetadata):
+    analysis: Analysis
+
+class AnalysisSummary(BaseModel):
+    id: int
+    session_id: Optional[str] = None
+    job_title: Optional[str] = None
+    industry: str
+    total_annual_savings: Optional[float] = None
+    created_at: datetime
+
+class AnalysisHistoryResponse(BaseModel):
+    items: List[AnalysisSummary]
+    next_cursor: Optional[str] = None
+
+class IndustryAggregate(BaseModel):
+    industry: str
+    analysis_count: int
+    fallback_rate: float
+    avg_total_annual_savings: float
+    avg_roi_percentage: float
+    avg_automation_potential_percentage: float
+
+class DailyAggregate(BaseModel):
+    day: date
+    analysis_count: int
+    fallback_rate: float
+    avg_total_annual_savings: float
+
+class JobTitleAggregate(BaseModel):
+    job_title: str
+    analysis_count: int
+
+class AggregatesResponse(BaseModel):
+    by_industry: List[IndustryAggregate]
+    by_day: List[DailyAggregate]
+    top_job_titles: List[JobTitleAggregate]
\ No newline at end of file
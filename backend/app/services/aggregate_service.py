@@ -0,0 +1,145 @@
+from datetime import date
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import AnalysisDailyRollup, JobAnalysis, JobTitleRollup, dialect_insert
+from app.schemas import AggregatesResponse, DailyAggregate, IndustryAggregate, JobTitleAggregate
+
+TOP_JOB_TITLES_LIMIT = 10
+
+def normalize_job_title(job_title: str) -> str:
+    """Collapse case and whitespace so "Sr. Analyst " and "sr. analyst" share a rollup row."""
+    return " ".join(job_title.lower().split())[:255]
+
+def _upsert(db: Session, model, values: dict, increments: dict):
+    """INSERT a rollup row or add the increments to the existing one."""
+    statement = dialect_insert(db)(model).values(**values, **increments)
+    primary_key = [column.name for column in model.__table__.primary_key.columns]
+    statement = statement.on_conflict_do_update(
+        index_elements=primary_key,
+        set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in increments}
+    )
+    db.execute(statement)
+
+class AggregateService:
+    def record_analysis(self, db: Session, analysis: JobAnalysis):
+        """
+        Fold a newly inserted analysis into the rollup tables.
+        Runs inside the caller's transaction so rollups stay consistent with job_analysis.
+        """
+        _upsert(
+            db,
+            AnalysisDailyRollup,
+            {"day": analysis.created_at.date(), "industry": analysis.industry},
+            {
+                "analysis_count": 1,
+                "fallback_count": 1 if analysis.is_fallback else 0,
+                "total_annual_savings_sum": analysis.total_annual_savings or 0,
+                "roi_percentage_sum": analysis.roi_percentage or 0,
+                "automation_potential_sum": analysis.automation_potential_percentage or 0
+            }
+        )
+
+        if analysis.job_title:
+            _upsert(
+                db,
+                JobTitleRollup,
+                {
+                    "job_title_key": normalize_job_title(analysis.job_title),
+                    "industry": analysis.industry,
+                    "job_title": analysis.job_title[:255]
+                },
+                {"analysis_count": 1}
+            )
+
+    def get_aggregates(
+        self,
+        db: Session,
+        start: date | None = None,
+        end: date | None = None,
+        industry: str | None = None
+    ) -> AggregatesResponse:
+        """
+        Read dashboard aggregates from the rollup tables.
+        start/end (inclusive) filter the industry and daily figures; job titles are all-time.
+        """
+        filters = []
+        if start is not None:
+            filters.append(AnalysisDailyRollup.day >= start)
+        if end is not None:
+            filters.append(AnalysisDailyRollup.day <= end)
+        if industry is not None:
+            filters.append(AnalysisDailyRollup.industry == industry)
+
+        count = func.sum(AnalysisDailyRollup.analysis_count)
+        fallback_count = func.sum(AnalysisDailyRollup.fallback_count)
+        savings = func.sum(AnalysisDailyRollup.total_annual_savings_sum)
+
+        industry_rows = (
+            db.query(
+                AnalysisDailyRollup.industry,
+                count.label("analysis_count"),
+                fallback_count.label("fallback_count"),
+                savings.label("savings"),
+                func.sum(AnalysisDailyRollup.roi_percentage_sum).label("roi"),
+                func.sum(AnalysisDailyRollup.automation_potential_sum).label("automation_potential")
+            )
+            .filter(*filters)
+            .group_by(AnalysisDailyRollup.industry)
+            .order_by(count.desc())
+            .all()
+        )
+        by_industry = [
+            IndustryAggregate(
+                industry=row.industry,
+                analysis_count=row.analysis_count,
+                fallback_rate=row.fallback_count / row.analysis_count,
+                avg_total_annual_savings=row.savings / row.analysis_count,
+                avg_roi_percentage=row.roi / row.analysis_count,
+                avg_automation_potential_percentage=row.automation_potential / row.analysis_count
+            )
+            for row in industry_rows
+            if row.analysis_count
+        ]
+
+        day_rows = (
+            db.query(
+                AnalysisDailyRollup.day,
+                count.label("analysis_count"),
+                fallback_count.label("fallback_count"),
+                savings.label("savings")
+            )
+            .filter(*filters)
+            .group_by(AnalysisDailyRollup.day)
+            .order_by(AnalysisDailyRollup.day)
+            .all()
+        )
+        by_day = [
+            DailyAggregate(
+                day=row.day,
+                analysis_count=row.analysis_count,
+                fallback_rate=row.fallback_count / row.analysis_count,
+                avg_total_annual_savings=row.savings / row.analysis_count
+            )
+            for row in day_rows
+            if row.analysis_count
+        ]
+
+        title_count = func.sum(JobTitleRollup.analysis_count)
+        title_query = db.query(
+            func.min(JobTitleRollup.job_title).label("job_title"),
+            title_count.label("analysis_count")
+        )
+        if industry is not None:
+            title_query = title_query.filter(JobTitleRollup.industry == industry)
+        title_rows = (
+            title_query.group_by(JobTitleRollup.job_title_key)
+            .order_by(title_count.desc())
+            .limit(TOP_JOB_TITLES_LIMIT)
+            .all()
+        )
+        top_job_titles = [
+            JobTitleAggregate(job_title=row.job_title, analysis_count=row.analysis_count)
+            for row in title_rows
+        ]
+
+        return AggregatesResponse(by_industry=by_industry, by_day=by_day, top_job_titles=top_job_titles)
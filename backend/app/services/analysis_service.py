@@ -1,41 +1,469 @@
-from typing import Dict, Any
+from typing import Dict, Any, NamedTuple, Optional
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.database import JobAnalysis
+from app.cache import CachedResponse, analysis_cache, make_etag, render_with_analysis, session_cache
+from app.deadline import ANALYZE_DEADLINE_SECONDS, BACKGROUND_DEADLINE_SECONDS, Deadline
+from app.database import JobAnalysis, JobDescription, dialect_insert, session_scope
 from app.openai_service import analyze_job_description as openai_analyze
+from app.scheduler import Priority, QuotaExceeded, TENANT_MAX_CONCURRENCY
+from app.schemas import AnalysisHistoryResponse, AnalysisSummary, AnalyzeRequest, StoredAnalysisMetadata
+from app.services.aggregate_service import AggregateService
+from app.shared_state import get_shared_state
+from app.storage import compress, compress_json, decompress_json, hash_content, pack_extracted
+import asyncio
+import base64
 import logging
+import os
+import uuid
 
 logger = logging.getLogger(__name__)
 
+MAX_HISTORY_PAGE_SIZE = 100
+# How often a request waiting on another worker's analysis checks for the stored result
+IN_FLIGHT_POLL_SECONDS = 0.5
+IN_FLIGHT_MARKER_GRACE_SECONDS = 10
+# Bulk and recompute analyses queued or running in this process; further submissions get a 429
+MAX_BACKGROUND_ANALYSES = int(os.getenv("MAX_BACKGROUND_ANALYSES", "500"))
+
+aggregate_service = AggregateService()
+
+def encode_cursor(created_at: datetime, analysis_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{analysis_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, analysis_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def summary_columns(analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the typed JobAnalysis summary columns from an analysis payload."""
+    extracted_job_data = analysis_data.get("extracted_job_data") or {}
+    executive_summary = analysis_data["executive_summary"]
+    job_title = extracted_job_data.get("job_title")
+    job_level = extracted_job_data.get("job_level")
+    return {
+        "job_title": job_title[:255] if job_title else None,
+        "job_level": job_level[:50] if job_level else None,
+        "total_annual_savings": executive_summary["total_annual_savings"],
+        "roi_percentage": analysis_data["roi_analysis"]["roi_percentage"],
+        "automation_potential_percentage": executive_summary["automation_potential_percentage"],
+        "is_fallback": bool(analysis_data.get("is_fallback"))
+    }
+
+def store_job_description(
+    db: Session,
+    job_description: str,
+    extracted_job_data: Optional[Dict[str, Any]]
+) -> JobDescription:
+    """Get or create the content-addressed row for a job description."""
+    content_hash = hash_content(job_description)
+    db.execute(
+        dialect_insert(db)(JobDescription)
+        .values(
+            content_hash=content_hash,
+            content=job_description,
+            extracted_job_data=compress_json(extracted_job_data) if extracted_job_data else None,
+            created_at=datetime.utcnow()
+        )
+        .on_conflict_do_nothing(index_elements=["content_hash"])
+    )
+    description = db.get(JobDescription, content_hash)
+
+    # First analysis of this description fell back; adopt the extraction from this one
+    if description.extracted_job_data is None and extracted_job_data:
+        description.extracted_job_data = compress_json(extracted_job_data)
+    return description
+
+class AnalysisResult(NamedTuple):
+    id: int
+    analysis_data: Dict[str, Any]
+    # Validated Analysis serialized once and shared by the response, the DB row and the cache
+    analysis_json: bytes
+    # True when the result came from an earlier or concurrent request with the same idempotency key
+    replayed: bool = False
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused with a different job description or industry."""
+
 class AnalysisService:
+    def __init__(self):
+        # Strong references to running bulk/recompute tasks so they aren't garbage collected
+        self._background_tasks: set[asyncio.Task] = set()
+        self._background_pending = 0
+        # Idempotency key -> (request fingerprint, running analysis) for analyses in flight in this process
+        self._in_flight: Dict[str, tuple[tuple[str, str], asyncio.Task]] = {}
+
     async def analyze_job_description(
-        self, 
-        job_description: str, 
-        industry: str, 
+        self,
+        job_description: str,
+        industry: str,
         user_email: str | None,
-        db: Session
-    ) -> tuple[int, Dict[str, Any]]:
+        session_id: str | None = None,
+        priority: Priority = Priority.INTERACTIVE,
+        deadline: Deadline | None = None,
+        idempotency_key: str | None = None,
+        tenant: str | None = None
+    ) -> AnalysisResult:
         """
         Analyze job description and save to database.
-        Returns: (analysis_id, analysis_data)
+        Upstream calls are scheduled under `tenant`, by default user_email or session_id.
+        With an idempotency_key, a repeated request returns the stored result or attaches to the
+        analysis already running for that key (in this or another worker) instead of starting a new one.
+        Raises IdempotencyConflict if the key was used for a different request.
         """
+        if deadline is None:
+            deadline = Deadline(
+                ANALYZE_DEADLINE_SECONDS if priority == Priority.INTERACTIVE else BACKGROUND_DEADLINE_SECONDS
+            )
+        args = (job_description, industry, user_email, session_id, priority, deadline, tenant or user_email or session_id)
+        if idempotency_key is None:
+            return await self._analyze(*args)
+
+        stored = await asyncio.to_thread(self._load_idempotent, idempotency_key, job_description, industry)
+        if stored is not None:
+            return stored
+
+        fingerprint = (hash_content(job_description), industry)
+        running = self._in_flight.get(idempotency_key)
+        if running is None:
+            task = asyncio.create_task(self._analyze_claimed(idempotency_key, *args))
+            self._in_flight[idempotency_key] = (fingerprint, task)
+            task.add_done_callback(lambda _: self._finish_in_flight(idempotency_key, task))
+            # Shielded so a disconnecting client doesn't cancel the analysis a retry would attach to
+            return await asyncio.shield(task)
+
+        running_fingerprint, task = running
+        if running_fingerprint != fingerprint:
+            raise IdempotencyConflict("Idempotency key is already in use for a different request")
+        return (await asyncio.shield(task))._replace(replayed=True)
+
+    def _finish_in_flight(self, idempotency_key: str, task: asyncio.Task):
+        self._in_flight.pop(idempotency_key, None)
+        # Every caller may have gone away; retrieve the error so it isn't reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def _analyze_claimed(self, idempotency_key: str, *args) -> AnalysisResult:
+        """Run an idempotent analysis once across workers, using an in-flight marker in shared state."""
+        job_description, industry, _, _, _, deadline, _ = args
+        state = get_shared_state()
+        marker = f"analyze:in-flight:{idempotency_key}"
+        # The marker outlives the owner's deadline only briefly, so a crashed worker can't block retries
+        ttl = deadline.remaining() + IN_FLIGHT_MARKER_GRACE_SECONDS
+
+        while not await asyncio.to_thread(state.add, marker, b"1", ttl):
+            # Another worker is running this key: wait for its result
+            await asyncio.sleep(IN_FLIGHT_POLL_SECONDS)
+            stored = await asyncio.to_thread(self._load_idempotent, idempotency_key, job_description, industry)
+            if stored is not None:
+                return stored
+
+        try:
+            # The previous owner may have finished between our first lookup and taking the marker
+            stored = await asyncio.to_thread(self._load_idempotent, idempotency_key, job_description, industry)
+            if stored is not None:
+                return stored
+            return await self._analyze(*args, idempotency_key=idempotency_key)
+        finally:
+            await asyncio.to_thread(state.delete, marker)
+
+    async def _analyze(
+        self,
+        job_description: str,
+        industry: str,
+        user_email: str | None,
+        session_id: str | None,
+        priority: Priority,
+        deadline: Deadline,
+        tenant: str | None,
+        idempotency_key: str | None = None
+    ) -> AnalysisResult:
         try:
-            # Analyze job description using OpenAI
-            analysis_data = await openai_analyze(job_description, industry)
-            
-            # Save to database
+            # Analyze job description using OpenAI - no DB connection is held meanwhile
+            analysis_data, analysis_json = await openai_analyze(
+                job_description, industry, priority=priority, tenant=tenant, deadline=deadline
+            )
+
+            # A fallback doesn't claim the key, so retrying can still produce a real analysis
+            if analysis_data.get("is_fallback"):
+                idempotency_key = None
+
+            # Save to database off the event loop, so waiting for a pooled connection blocks nothing else
+            try:
+                metadata = await asyncio.to_thread(
+                    self._save_analysis,
+                    job_description, industry, user_email, session_id, idempotency_key, analysis_data, analysis_json
+                )
+            except IntegrityError:
+                # Lost a race on the unique idempotency key; the winner's row is the result
+                stored = None
+                if idempotency_key is not None:
+                    stored = await asyncio.to_thread(
+                        self._load_idempotent, idempotency_key, job_description, industry
+                    )
+                if stored is None:
+                    raise
+                return stored
+
+            # Warm the read cache so the results page and email link don't hit the DB
+            await asyncio.to_thread(self._cache_response, metadata, analysis_json, True)
+
+            return AnalysisResult(metadata.id, analysis_data, analysis_json)
+
+        except Exception as e:
+            logger.error(f"Analysis error: {str(e)}")
+            raise
+
+    def _load_idempotent(self, idempotency_key: str, job_description: str, industry: str) -> Optional[AnalysisResult]:
+        """The stored result for an idempotency key, or None. Raises IdempotencyConflict on a mismatch."""
+        with session_scope() as db:
+            db_analysis = db.query(JobAnalysis).filter(JobAnalysis.idempotency_key == idempotency_key).first()
+            if db_analysis is None:
+                return None
+            if db_analysis.description_hash != hash_content(job_description) or db_analysis.industry != industry:
+                raise IdempotencyConflict("Idempotency key was already used for a different request")
+            return AnalysisResult(
+                db_analysis.id, db_analysis.analysis_result, db_analysis.analysis_json, replayed=True
+            )
+
+    def submit_bulk(self, requests: list[AnalyzeRequest], priority: Priority = Priority.BULK) -> list[str]:
+        """
+        Queue analyses to run in the background at bulk priority.
+        Returns the session id under which each result can be fetched. Client-supplied session ids
+        are idempotency keys, so resubmitting a batch doesn't analyze its items twice.
+        Raises QuotaExceeded when MAX_BACKGROUND_ANALYSES would be exceeded.
+        """
+        session_ids = [request.session_id or uuid.uuid4().hex for request in requests]
+        items = [
+            (request.job_description, request.industry, request.user_email, session_id, request.session_id)
+            for request, session_id in zip(requests, session_ids)
+        ]
+        # The whole batch is one tenant, so it gets one tenant's share of the scheduler however many items it has
+        self._start_background(items, priority, tenant=f"bulk:{uuid.uuid4().hex}")
+        return session_ids
+
+    async def submit_recompute(self, analysis_id: int) -> Optional[str]:
+        """
+        Re-run a stored analysis at recompute priority; the result is stored as a new analysis
+        under the same session id. Returns that session id, or None if the analysis doesn't exist.
+        Raises QuotaExceeded when MAX_BACKGROUND_ANALYSES would be exceeded.
+        """
+        self._check_background_capacity(1)
+        def load():
+            with session_scope() as db:
+                db_analysis = db.get(JobAnalysis, analysis_id)
+                if db_analysis is None:
+                    return None
+                return (
+                    db_analysis.job_description,
+                    db_analysis.industry,
+                    db_analysis.user_email,
+                    db_analysis.session_id or uuid.uuid4().hex,
+                    # A recompute deliberately produces a new result, so it has no idempotency key
+                    None
+                )
+
+        item = await asyncio.to_thread(load)
+        if item is None:
+            return None
+        self._start_background([item], Priority.RECOMPUTE)
+        return item[3]
+
+    def _check_background_capacity(self, count: int):
+        if self._background_pending + count > MAX_BACKGROUND_ANALYSES:
+            raise QuotaExceeded(
+                f"Too many queued background analyses ({self._background_pending} of {MAX_BACKGROUND_ANALYSES})"
+            )
+
+    def _start_background(self, items: list[tuple], priority: Priority, tenant: str | None = None):
+        self._check_background_capacity(len(items))
+        self._background_pending += len(items)
+        task = asyncio.create_task(self._run_batch(items, priority, tenant))
+        self._background_tasks.add(task)
+
+        def done(task: asyncio.Task):
+            self._background_tasks.discard(task)
+            self._background_pending -= len(items)
+
+        task.add_done_callback(done)
+
+    async def _run_batch(self, items: list[tuple], priority: Priority, tenant: str | None):
+        # Keep at most a tenant's concurrency quota in flight, so a batch never trips its queue quota
+        semaphore = asyncio.Semaphore(TENANT_MAX_CONCURRENCY)
+
+        async def run_one(job_description, industry, user_email, session_id, idempotency_key):
+            async with semaphore:
+                try:
+                    await self.analyze_job_description(
+                        job_description, industry, user_email, session_id, priority,
+                        idempotency_key=idempotency_key, tenant=tenant
+                    )
+                except Exception as e:
+                    logger.error(f"{priority.value} analysis for session {session_id} failed: {e}")
+
+        await asyncio.gather(*(run_one(*item) for item in items))
+
+    def cancel_background(self):
+        """Cancel queued and running bulk/recompute work, e.g. on shutdown."""
+        for task in list(self._background_tasks):
+            task.cancel()
+
+    def _save_analysis(
+        self,
+        job_description: str,
+        industry: str,
+        user_email: str | None,
+        session_id: str | None,
+        idempotency_key: str | None,
+        analysis_data: Dict[str, Any],
+        analysis_json: bytes
+    ) -> StoredAnalysisMetadata:
+        """Insert an analysis in its own short-lived session. Returns the metadata for the cache."""
+        extracted_job_data = analysis_data.get("extracted_job_data")
+        with session_scope() as db:
+            description = store_job_description(db, job_description, extracted_job_data)
+            description_extracted = (
+                decompress_json(description.extracted_job_data) if description.extracted_job_data else None
+            )
             db_analysis = JobAnalysis(
-                job_description=job_description,
+                description=description,
                 user_email=user_email,
+                session_id=session_id,
+                idempotency_key=idempotency_key,
                 industry=industry,
-                analysis_result=analysis_data
+                analysis_payload=compress(analysis_json),
+                extracted_job_data=pack_extracted(extracted_job_data, description_extracted),
+                created_at=datetime.utcnow(),
+                **summary_columns(analysis_data)
             )
             db.add(db_analysis)
+            db.flush()
+            aggregate_service.record_analysis(db, db_analysis)
+            # Read everything the cache needs before commit expires the instance
+            metadata = self._metadata(db_analysis)
             db.commit()
-            db.refresh(db_analysis)
-            
-            return db_analysis.id, analysis_data
-            
-        except Exception as e:
-            logger.error(f"Analysis error: {str(e)}")
-            db.rollback()
-            raise
\ No newline at end of file
+            return metadata
+
+    def get_analysis(self, analysis_id: int) -> Optional[CachedResponse]:
+        """
+        Fetch a stored analysis by id.
+        Returns the rendered response body and its ETag, or None if not found.
+        Only opens a DB session on a cache miss.
+        """
+        cached = analysis_cache.get(f"id:{analysis_id}")
+        if cached is not None:
+            return cached
+
+        with session_scope() as db:
+            db_analysis = db.get(JobAnalysis, analysis_id)
+            if db_analysis is None:
+                return None
+            return self._cache_response(self._metadata(db_analysis), db_analysis.analysis_json)
+
+    def get_analysis_by_session(self, session_id: str) -> Optional[CachedResponse]:
+        """
+        Fetch the most recent stored analysis for a frontend session id.
+        Returns the rendered response body and its ETag, or None if not found.
+        Only opens a DB session on a cache miss.
+        """
+        cached = session_cache.get(session_id)
+        if cached is not None:
+            return cached
+
+        with session_scope() as db:
+            db_analysis = (
+                db.query(JobAnalysis)
+                .filter(JobAnalysis.session_id == session_id)
+                .order_by(JobAnalysis.created_at.desc(), JobAnalysis.id.desc())
+                .first()
+            )
+            if db_analysis is None:
+                return None
+            return self._cache_response(self._metadata(db_analysis), db_analysis.analysis_json, True)
+
+    def list_analyses(
+        self,
+        db: Session,
+        user_email: str | None = None,
+        session_id: str | None = None,
+        limit: int = 20,
+        cursor: str | None = None
+    ) -> AnalysisHistoryResponse:
+        """
+        List analyses for a user email or session id, newest first.
+        Uses keyset pagination on (created_at, id) and only reads summary columns.
+        """
+        if (user_email is None) == (session_id is None):
+            raise ValueError("Exactly one of user_email or session_id is required")
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+        query = db.query(
+            JobAnalysis.id,
+            JobAnalysis.session_id,
+            JobAnalysis.job_title,
+            JobAnalysis.industry,
+            JobAnalysis.total_annual_savings,
+            JobAnalysis.created_at
+        )
+        if user_email is not None:
+            query = query.filter(JobAnalysis.user_email == user_email)
+        else:
+            query = query.filter(JobAnalysis.session_id == session_id)
+
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.filter(
+                tuple_(JobAnalysis.created_at, JobAnalysis.id) < tuple_(cursor_created_at, cursor_id)
+            )
+
+        # Fetch one extra row to know whether another page exists
+        rows = (
+            query.order_by(JobAnalysis.created_at.desc(), JobAnalysis.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        items = [AnalysisSummary.model_validate(row._asdict()) for row in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+
+        return AnalysisHistoryResponse(items=items, next_cursor=next_cursor)
+
+    def _metadata(self, db_analysis: JobAnalysis) -> StoredAnalysisMetadata:
+        return StoredAnalysisMetadata(
+            id=db_analysis.id,
+            session_id=db_analysis.session_id,
+            industry=db_analysis.industry,
+            job_title=db_analysis.job_title,
+            job_description=db_analysis.job_description,
+            created_at=db_analysis.created_at
+        )
+
+    def _cache_response(
+        self,
+        metadata: StoredAnalysisMetadata,
+        analysis_json: bytes,
+        latest_for_session: bool = False
+    ) -> CachedResponse:
+        """
+        Render a stored analysis response around the stored Analysis bytes and cache it.
+        Only callers that know this is the session's latest analysis (the insert and the session
+        lookup) set latest_for_session; a read by id may be an older row of the session.
+        """
+        body = render_with_analysis(metadata.model_dump_json().encode(), analysis_json)
+        cached = CachedResponse(body=body, etag=make_etag(body))
+
+        analysis_cache.set(f"id:{metadata.id}", cached)
+        if latest_for_session and metadata.session_id:
+            session_cache.set(metadata.session_id, cached)
+        return cached
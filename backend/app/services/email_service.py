@@ -1,8 +1,6 @@
-import resend
 import os
 import asyncio
 from typing import Dict, Any
-from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
 import logging
 from datetime import datetime
@@ -11,12 +9,34 @@ logger = logging.getLogger(__name__)
 
 class EmailService:
     def __init__(self):
-        resend.api_key = os.getenv("RESEND_API_KEY")
-        
-        # Setup Jinja2 for email templates
-        template_path = Path(__file__).parent.parent / "templates" / "email"
-        self.env = Environment(loader=FileSystemLoader(template_path))
-        
+        # resend and jinja2 are imported on first use to keep startup fast
+        self._env = None
+        self._resend = None
+
+    @property
+    def env(self):
+        if self._env is None:
+            from jinja2 import Environment, FileSystemLoader
+
+            # Setup Jinja2 for email templates
+            template_path = Path(__file__).parent.parent / "templates" / "email"
+            self._env = Environment(loader=FileSystemLoader(template_path))
+        return self._env
+
+    @property
+    def resend(self):
+        if self._resend is None:
+            import resend
+
+            resend.api_key = os.getenv("RESEND_API_KEY")
+            self._resend = resend
+        return self._resend
+
+    def warm_up(self):
+        """Import the email dependencies and compile the template ahead of the first send."""
+        self.env.get_template("analysis_results.html")
+        self.resend
+
     async def send_analysis_email(
         self,
         to_email: str,
@@ -47,7 +67,7 @@ class EmailService:
                 "html": html_content,
             }
             
-            response = resend.Emails.send(params)
+            response = self.resend.Emails.send(params)
             logger.info(f"Email sent successfully to {to_email}. ID: {response.get('id')}")
             
         except Exception as e:
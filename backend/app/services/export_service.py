@@ -0,0 +1,256 @@
+from typing import Any, Dict, Iterator, List, Tuple
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.database import JobAnalysis
+from app.storage import decompress_json
+import csv
+import io
+import json
+
+# Rows fetched per round trip from the server-side cursor, and rows per output chunk
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Column name -> type for each exportable table; types drive the Parquet schema.
+# No session_id or user_email: a session_id is the only credential for reading an analysis back
+ANALYSES_COLUMNS: List[Tuple[str, str]] = [
+    ("analysis_id", "int"),
+    ("created_at", "datetime"),
+    ("industry", "str"),
+    ("job_title", "str"),
+    ("job_level", "str"),
+    ("total_annual_savings", "float"),
+    ("roi_percentage", "float"),
+    ("automation_potential_percentage", "float"),
+    ("is_fallback", "bool"),
+]
+
+TASKS_COLUMNS: List[Tuple[str, str]] = [
+    ("analysis_id", "int"),
+    ("created_at", "datetime"),
+    ("industry", "str"),
+    ("task_index", "int"),
+    ("task_name", "str"),
+    ("description", "str"),
+    ("automation_potential", "float"),
+    ("estimated_time_savings_hours_per_week", "float"),
+    ("estimated_annual_savings", "float"),
+    ("automation_approach", "str"),
+    ("implementation_difficulty", "str"),
+]
+
+ROADMAP_COLUMNS: List[Tuple[str, str]] = [
+    ("analysis_id", "int"),
+    ("created_at", "datetime"),
+    ("industry", "str"),
+    ("phase_index", "int"),
+    ("phase", "str"),
+    ("timeline", "str"),
+    ("tasks", "str"),
+    ("estimated_savings", "float"),
+    ("complexity", "str"),
+]
+
+EXPORT_TABLES = {
+    "analyses": ANALYSES_COLUMNS,
+    "tasks": TASKS_COLUMNS,
+    "roadmap": ROADMAP_COLUMNS,
+}
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class _ChunkSink:
+    """Write-only file object that lets the Parquet writer's output be drained incrementally."""
+
+    def __init__(self):
+        self._buffer = io.BytesIO()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buffer.write(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer = io.BytesIO()
+        return data
+
+class ExportService:
+    def iter_rows(
+        self,
+        db: Session,
+        table: str,
+        industry: str | None = None,
+        start: date | None = None,
+        end: date | None = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream flattened export rows for one table.
+        Rows come from a server-side cursor, so memory use does not grow with the table.
+        """
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unknown export table: {table}")
+
+        if table == "analyses":
+            # Summary columns only - no need to pull the analysis payload
+            columns = [
+                JobAnalysis.id.label("analysis_id"),
+                JobAnalysis.created_at,
+                JobAnalysis.industry,
+                JobAnalysis.job_title,
+                JobAnalysis.job_level,
+                JobAnalysis.total_annual_savings,
+                JobAnalysis.roi_percentage,
+                JobAnalysis.automation_potential_percentage,
+                JobAnalysis.is_fallback,
+            ]
+        else:
+            columns = [
+                JobAnalysis.id.label("analysis_id"),
+                JobAnalysis.created_at,
+                JobAnalysis.industry,
+                JobAnalysis.analysis_payload,
+            ]
+
+        statement = select(*columns).order_by(JobAnalysis.id)
+        if industry is not None:
+            statement = statement.where(JobAnalysis.industry == industry)
+        if start is not None:
+            statement = statement.where(JobAnalysis.created_at >= datetime.combine(start, time.min))
+        if end is not None:
+            statement = statement.where(JobAnalysis.created_at < datetime.combine(end + timedelta(days=1), time.min))
+
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for row in result:
+            if table == "analyses":
+                yield row._asdict()
+                continue
+
+            # extracted_job_data is not exported, so the description row is never needed
+            analysis_result = decompress_json(row.analysis_payload)
+            if table == "tasks":
+                yield from self._task_rows(row, analysis_result)
+            else:
+                yield from self._roadmap_rows(row, analysis_result)
+
+    def _task_rows(self, row, analysis_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for index, task in enumerate(analysis_result.get("task_breakdown") or []):
+            yield {
+                "analysis_id": row.analysis_id,
+                "created_at": row.created_at,
+                "industry": row.industry,
+                "task_index": index,
+                **{name: task.get(name) for name, _ in TASKS_COLUMNS[4:]},
+            }
+
+    def _roadmap_rows(self, row, analysis_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for index, phase in enumerate(analysis_result.get("implementation_roadmap") or []):
+            yield {
+                "analysis_id": row.analysis_id,
+                "created_at": row.created_at,
+                "industry": row.industry,
+                "phase_index": index,
+                "phase": phase.get("phase"),
+                "timeline": phase.get("timeline"),
+                "tasks": "; ".join(phase.get("tasks") or []),
+                "estimated_savings": phase.get("estimated_savings"),
+                "complexity": phase.get("complexity"),
+            }
+
+    def stream(
+        self,
+        db: Session,
+        table: str,
+        format: str,
+        industry: str | None = None,
+        start: date | None = None,
+        end: date | None = None
+    ) -> Iterator[bytes]:
+        """Stream an export table encoded as NDJSON, CSV or Parquet, one chunk per batch of rows."""
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unknown export table: {table}")
+
+        if format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)") from e
+
+        rows = self.iter_rows(db, table, industry=industry, start=start, end=end)
+        columns = EXPORT_TABLES[table]
+        if format == "ndjson":
+            return self._ndjson_chunks(rows)
+        if format == "csv":
+            return self._csv_chunks(rows, columns)
+        return self._parquet_chunks(rows, columns)
+
+    def _batches(self, rows: Iterator[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _ndjson_chunks(self, rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+        for batch in self._batches(rows):
+            yield "".join(json.dumps(row, default=_json_default) + "\n" for row in batch).encode()
+
+    def _csv_chunks(self, rows: Iterator[Dict[str, Any]], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=[name for name, _ in columns])
+        writer.writeheader()
+        for batch in self._batches(rows):
+            writer.writerows(batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    def _parquet_chunks(self, rows: Iterator[Dict[str, Any]], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow_types = {
+            "int": pa.int64(),
+            "float": pa.float64(),
+            "str": pa.string(),
+            "bool": pa.bool_(),
+            "datetime": pa.timestamp("us"),
+        }
+        schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+
+        # Each batch becomes one row group, drained from the sink as soon as it is written
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for batch in self._batches(rows):
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                yield sink.drain()
+        yield sink.drain()
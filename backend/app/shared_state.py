@@ -0,0 +1,242 @@
+"""
+State shared between uvicorn workers and replicas: response caches, upstream
+rate budgets and in-flight markers.
+
+SHARED_STATE_BACKEND selects the implementation:
+
+- memory: per-process dict (default; single worker / development)
+- sqlite: a WAL-mode SQLite file shared by every worker on one host (SHARED_STATE_PATH)
+- database: the shared_state table in the application database, shared by every replica
+
+All three support the same small set of atomic operations, so callers never
+need to know which one is configured.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, case, create_engine, event, or_, select
+
+from app.database import SharedStateEntry, dialect_insert, get_engine
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory")
+SHARED_STATE_PATH = os.getenv(
+    "SHARED_STATE_PATH", os.path.join(tempfile.gettempdir(), "ai-scanner-shared-state.db")
+)
+# Upper bound on cached values held by the memory backend
+SHARED_STATE_MAX_ENTRIES = int(os.getenv("SHARED_STATE_MAX_ENTRIES", "1024"))
+# How often expired rows are deleted by the SQL backends
+PURGE_INTERVAL = 60
+
+def _expiry(ttl: Optional[float]) -> Optional[float]:
+    return time.time() + ttl if ttl else None
+
+class SharedState:
+    """Interface implemented by every backend. Values are bytes; ttl is in seconds (None never expires)."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set key only if it is absent or expired. Returns True if this call set it."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add to a counter and return the new value. ttl applies when the counter is created."""
+        raise NotImplementedError
+
+class MemoryState(SharedState):
+    """Per-process state. Values are evicted least-recently-used beyond maxsize."""
+
+    def __init__(self, maxsize: int = SHARED_STATE_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._values: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._counters: Dict[str, Tuple[int, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self._last_purge = time.time()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._values[key]
+            return None
+        self._values.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._values[key] = (value, _expiry(ttl))
+        self._values.move_to_end(key)
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+            self._counters.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge > PURGE_INTERVAL:
+                self._counters = {
+                    k: (count, expires_at) for k, (count, expires_at) in self._counters.items()
+                    if expires_at is None or expires_at > now
+                }
+                self._last_purge = now
+
+            entry = self._counters.get(key)
+            if entry is None or entry[1] is not None and entry[1] <= now:
+                entry = (0, _expiry(ttl))
+            count = entry[0] + amount
+            self._counters[key] = (count, entry[1])
+            return count
+
+class DatabaseState(SharedState):
+    """State kept in the shared_state table of a SQL database (Postgres or SQLite)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.insert = dialect_insert(engine)
+        self.table = SharedStateEntry.__table__
+        self._last_purge = 0.0
+
+    def _expired(self, now: float):
+        return and_(self.table.c.expires_at.isnot(None), self.table.c.expires_at <= now)
+
+    def _maybe_purge(self, conn, now: float) -> None:
+        if now - self._last_purge > PURGE_INTERVAL:
+            self._last_purge = now
+            conn.execute(self.table.delete().where(self._expired(now)))
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        table = self.table
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(table.c.value).where(
+                    table.c.key == key,
+                    or_(table.c.expires_at.is_(None), table.c.expires_at > now)
+                )
+            ).scalar()
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        stmt = self.insert(self.table).values(key=key, value=value, counter=0, expires_at=_expiry(ttl))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.table.c.key],
+            set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+            self._maybe_purge(conn, now)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        stmt = self.insert(self.table).values(key=key, value=value, counter=0, expires_at=_expiry(ttl))
+        # Only take over an existing row once it has expired
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.table.c.key],
+            set_={"value": stmt.excluded.value, "counter": 0, "expires_at": stmt.excluded.expires_at},
+            where=self._expired(now)
+        )
+        with self.engine.begin() as conn:
+            added = conn.execute(stmt).rowcount == 1
+            self._maybe_purge(conn, now)
+        return added
+
+    def delete(self, key: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.key == key))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        table = self.table
+        stmt = self.insert(table).values(key=key, value=None, counter=amount, expires_at=_expiry(ttl))
+        # An expired counter restarts from this increment with a fresh ttl
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                "counter": case(
+                    (self._expired(now), stmt.excluded.counter),
+                    else_=table.c.counter + stmt.excluded.counter
+                ),
+                "expires_at": case(
+                    (self._expired(now), stmt.excluded.expires_at),
+                    else_=table.c.expires_at
+                ),
+            }
+        ).returning(table.c.counter)
+        with self.engine.begin() as conn:
+            count = conn.execute(stmt).scalar_one()
+            self._maybe_purge(conn, now)
+        return count
+
+class SQLiteState(DatabaseState):
+    """
+    State in a local SQLite file, shared by every worker process on one host.
+    The file is scratch space outside the application schema, so its table is created here.
+    """
+
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 5})
+
+        @event.listens_for(engine, "connect")
+        def _configure(dbapi_connection, connection_record):
+            # WAL lets readers proceed while another worker writes
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+            dbapi_connection.execute("PRAGMA synchronous=NORMAL")
+
+        SharedStateEntry.__table__.create(engine, checkfirst=True)
+        super().__init__(engine)
+
+_shared_state: Optional[SharedState] = None
+_shared_state_lock = threading.Lock()
+
+def get_shared_state() -> SharedState:
+    """Return the configured backend, creating it on first use."""
+    global _shared_state
+    if _shared_state is None:
+        with _shared_state_lock:
+            if _shared_state is None:
+                if SHARED_STATE_BACKEND == "memory":
+                    _shared_state = MemoryState()
+                elif SHARED_STATE_BACKEND == "sqlite":
+                    _shared_state = SQLiteState()
+                elif SHARED_STATE_BACKEND == "database":
+                    engine = get_engine()
+                    if engine is None:
+                        raise Exception("SHARED_STATE_BACKEND=database requires DATABASE_URL")
+                    _shared_state = DatabaseState(engine)
+                else:
+                    raise ValueError(f"Unknown SHARED_STATE_BACKEND: {SHARED_STATE_BACKEND}")
+    return _shared_state
@@ -0,0 +1,42 @@
+"""
+Compact storage encoding for job descriptions and analysis payloads.
+
+Job descriptions are content-addressed by SHA-256 so identical postings are
+stored once. The analysis payload is the zstd-compressed JSON of the validated
+Analysis - the exact bytes sent in the HTTP response - so reads can be served
+by decompressing alone. extracted_job_data is stored separately and only when
+it differs from the copy kept with the description.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+import zstandard
+
+ZSTD_LEVEL = 3
+
+def hash_content(text: str) -> str:
+    """SHA-256 hex digest used as the job description key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def compress(raw: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+
+def decompress(blob: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(blob)
+
+def compress_json(data: Any) -> bytes:
+    return compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+def decompress_json(blob: bytes) -> Any:
+    return json.loads(decompress(blob))
+
+def pack_extracted(
+    extracted_job_data: Optional[Dict[str, Any]],
+    description_extracted: Optional[Dict[str, Any]]
+) -> Optional[bytes]:
+    """Encode extracted_job_data for job_analysis, or None when the description's copy is identical."""
+    if extracted_job_data is None or extracted_job_data == description_extracted:
+        return None
+    return compress_json(extracted_job_data)
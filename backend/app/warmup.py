@@ -0,0 +1,89 @@
+"""
+Background warm-up of the database pool, OpenAI client and email templates.
+
+Heavy dependencies are imported lazily, so the first request would otherwise
+pay for imports, TLS handshakes and pool connections. Warm-up runs after the
+server starts accepting connections; /ready reports ready only once every
+component has warmed successfully.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import text
+
+from app.database import get_engine
+from app.openai_service import get_openai_client
+
+logger = logging.getLogger(__name__)
+
+WARMUP_RETRY_MAX_DELAY = 30
+
+class NotConfigured(Exception):
+    """A component can never become ready because its configuration is missing."""
+
+class Readiness:
+    def __init__(self, components: List[str]):
+        self.components: Dict[str, str] = {component: "pending" for component in components}
+
+    def mark(self, component: str, status: str):
+        self.components[component] = status
+
+    @property
+    def ready(self) -> bool:
+        return all(status == "ready" for status in self.components.values())
+
+readiness = Readiness(["database", "llm", "email"])
+
+def _warm_database():
+    engine = get_engine()
+    if engine is None:
+        raise NotConfigured("DATABASE_URL not configured")
+
+    # Check out as many connections as the pool keeps open, so none are opened on the request path
+    pool_size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = [engine.connect() for _ in range(pool_size)]
+    try:
+        for connection in connections:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+async def warm_database():
+    await asyncio.to_thread(_warm_database)
+
+async def warm_llm():
+    if not os.getenv("OPENAI_API_KEY"):
+        raise NotConfigured("OPENAI_API_KEY not configured")
+    # Imports openai and opens a keep-alive connection that later completions reuse
+    await get_openai_client().models.list()
+
+async def _warm_with_retry(component: str, warm: Callable[[], Awaitable[None]]):
+    delay = 1
+    while True:
+        try:
+            await warm()
+        except NotConfigured as e:
+            readiness.mark(component, f"not configured: {e}")
+            logger.warning(f"Warm-up of {component} skipped: {e}")
+            return
+        except Exception as e:
+            readiness.mark(component, f"retrying: {e}")
+            logger.warning(f"Warm-up of {component} failed, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_DELAY)
+        else:
+            readiness.mark(component, "ready")
+            logger.info(f"Warm-up of {component} complete")
+            return
+
+def start_warmup(email_service) -> List[asyncio.Task]:
+    """Start warming every component in the background; returns the tasks so shutdown can cancel them."""
+    return [
+        asyncio.create_task(_warm_with_retry("database", warm_database)),
+        asyncio.create_task(_warm_with_retry("llm", warm_llm)),
+        asyncio.create_task(_warm_with_retry("email", lambda: asyncio.to_thread(email_service.warm_up))),
+    ]
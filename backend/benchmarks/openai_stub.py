@@ -0,0 +1,145 @@
+"""
+Local OpenAI-compatible stub for exercising model routing, deadlines and hedging.
+
+Serves /v1/chat/completions and /v1/models. Each model answers after a
+simulated latency (with jitter and an occasional slow tail), and can be made
+to return invalid JSON or 500s at a given rate. Extraction requests get a
+canned extraction, everything else a valid Analysis.
+
+Run from the backend directory:
+
+    python benchmarks/openai_stub.py --port 8100 \
+        --latency gpt-4o-mini=0.8 --latency gpt-4=6 --invalid gpt-4o-mini=0.1
+
+then point the API at it:
+
+    OPENAI_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=stub uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.openai_service import create_fallback_analysis
+
+# Median seconds per model when not given on the command line
+DEFAULT_LATENCIES = {
+    "gpt-4o-mini": 0.8,
+    "gpt-3.5-turbo": 0.9,
+    "gpt-4o": 2.5,
+    "gpt-4-turbo": 4.0,
+    "gpt-4": 8.0,
+}
+# Share of calls that take TAIL_MULTIPLIER times longer
+TAIL_RATE = 0.05
+TAIL_MULTIPLIER = 4
+
+EXTRACTION = {
+    "salary_range": {
+        "min": 60000,
+        "max": 80000,
+        "currency": "USD",
+        "pay_frequency": "annual",
+        "annualized_min": 60000,
+        "annualized_max": 80000
+    },
+    "job_level": "mid",
+    "experience_required": {"min_years": 2, "max_years": 5},
+    "location": "Remote",
+    "job_title": "Operations Coordinator",
+    "department": "Operations",
+    "company_size": None,
+    "key_responsibilities": ["Data entry", "Reporting", "Scheduling"],
+    "required_skills": ["Excel", "Communication"],
+    "education_level": "Bachelor's"
+}
+
+def _analysis() -> Dict:
+    analysis = create_fallback_analysis("", "Technology")
+    analysis.pop("is_fallback", None)
+    return analysis
+
+def create_stub_app(latencies: Dict[str, float], invalid_rates: Dict[str, float], error_rates: Dict[str, float]) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+    analysis_json = json.dumps(_analysis())
+    extraction_json = json.dumps(EXTRACTION)
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": model, "object": "model", "owned_by": "stub"} for model in latencies]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body["model"]
+        messages = body["messages"]
+
+        latency = latencies.get(model, 1.0) * random.uniform(0.7, 1.3)
+        if random.random() < TAIL_RATE:
+            latency *= TAIL_MULTIPLIER
+        await asyncio.sleep(latency)
+
+        if random.random() < error_rates.get(model, 0.0):
+            return JSONResponse(status_code=500, content={"error": {"message": "stub error", "type": "server_error"}})
+
+        is_extraction = "extraction" in messages[0]["content"]
+        content = extraction_json if is_extraction else analysis_json
+        if random.random() < invalid_rates.get(model, 0.0):
+            content = content[: len(content) // 2]
+
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-stub-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    return app
+
+def parse_rates(values) -> Dict[str, float]:
+    """Turn ["model=1.5", ...] into {"model": 1.5}."""
+    rates = {}
+    for value in values or []:
+        model, rate = value.split("=", 1)
+        rates[model] = float(rate)
+    return rates
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub with per-model simulated latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", action="append", metavar="MODEL=SECONDS", help="Median latency for a model")
+    parser.add_argument("--invalid", action="append", metavar="MODEL=RATE", help="Share of truncated (invalid JSON) responses")
+    parser.add_argument("--error", action="append", metavar="MODEL=RATE", help="Share of HTTP 500 responses")
+    return parser
+
+def stub_from_args(args) -> FastAPI:
+    return create_stub_app(
+        {**DEFAULT_LATENCIES, **parse_rates(args.latency)},
+        parse_rates(args.invalid),
+        parse_rates(args.error)
+    )
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = build_parser().parse_args()
+    uvicorn.run(stub_from_args(args), host=args.host, port=args.port, log_level="warning")
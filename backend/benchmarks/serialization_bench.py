@@ -0,0 +1,131 @@
+"""
+Benchmark the per-request serialization work of a successful /api/analyze call.
+
+Compares the previous path (validate the dict into Analysis, wrap it in
+AnalyzeResponse, let FastAPI re-validate and JSON-encode it, encode the dict
+again for the DB column and validate/encode a third time for the cache) with
+the single-validation path that ships: serialize_analysis dumps the validated
+Analysis once to a dict (extracted data, rollups, email) and once to JSON, and
+the same bytes are spliced into the HTTP response, the stored payload and the
+cache entry.
+
+Run from the backend directory:
+
+    python benchmarks/serialization_bench.py [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from app.cache import make_etag, render_with_analysis
+from app.openai_service import create_fallback_analysis, serialize_analysis
+from app.schemas import Analysis, AnalyzeResponse, StoredAnalysisMetadata, StoredAnalysisResponse
+from app.storage import compress, compress_json, decompress_json
+
+
+def sample_analysis() -> dict:
+    """A fallback analysis padded to the size of a typical GPT-4 response."""
+    analysis = create_fallback_analysis("Sample job description", "Information Technology")
+    analysis.pop("is_fallback")
+    analysis["task_breakdown"] = analysis["task_breakdown"] * 4
+    analysis["implementation_roadmap"] = analysis["implementation_roadmap"] * 2
+    analysis["extracted_job_data"] = {
+        "job_title": "Senior Data Analyst",
+        "job_level": "senior",
+        "key_responsibilities": ["Build dashboards", "Maintain ETL pipelines", "Report to leadership"],
+        "required_skills": ["SQL", "Python", "Tableau"],
+    }
+    return analysis
+
+
+METADATA = {
+    "id": 123,
+    "session_id": "analysis-1700000000000-abc123def",
+    "industry": "Information Technology",
+    "job_title": "Senior Data Analyst",
+    "job_description": "We are looking for a Senior Data Analyst... " * 20,
+    "created_at": datetime(2026, 1, 1, 12, 0, 0),
+}
+
+
+def previous_path(analysis_data: dict) -> bytes:
+    # DB column: the whole dict encoded and compressed
+    compress_json(analysis_data)
+
+    # main.py: Analysis(**data) wrapped in AnalyzeResponse
+    response = AnalyzeResponse(id=METADATA["id"], analysis=Analysis(**analysis_data))
+
+    # FastAPI response_model handling: dump, re-validate, jsonable_encoder, json.dumps
+    validated = AnalyzeResponse.model_validate(response.model_dump())
+    body = json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+    # Cache warm: validate and encode the stored analysis a third time
+    cached = StoredAnalysisResponse(**METADATA, analysis=Analysis(**analysis_data)).model_dump_json().encode()
+    make_etag(cached)
+    return body
+
+
+def single_pass_path(analysis_data: dict) -> bytes:
+    analysis_data, analysis_json = serialize_analysis(
+        Analysis.model_validate(analysis_data), extracted_job_data=analysis_data["extracted_job_data"]
+    )
+
+    # DB columns: the same bytes compressed, extracted data kept separately
+    compress(analysis_json)
+    compress_json(analysis_data["extracted_job_data"])
+
+    body = render_with_analysis(b'{"id":%d}' % METADATA["id"], analysis_json)
+
+    metadata = StoredAnalysisMetadata(**METADATA)
+    cached = render_with_analysis(metadata.model_dump_json().encode(), analysis_json)
+    make_etag(cached)
+    return body
+
+
+def measure(name: str, path, analysis_data: dict, iterations: int) -> tuple[float, int]:
+    for _ in range(50):
+        path(analysis_data)
+
+    start = time.process_time()
+    for _ in range(iterations):
+        path(analysis_data)
+    cpu_us = (time.process_time() - start) / iterations * 1e6
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    path(analysis_data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<14} {cpu_us:>10.1f} us/request {peak / 1024:>10.1f} KiB peak allocation")
+    return cpu_us, peak
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    analysis_data = sample_analysis()
+
+    # Both paths must produce equivalent response bodies
+    assert json.loads(previous_path(analysis_data)) == json.loads(single_pass_path(analysis_data))
+    assert decompress_json(compress_json(analysis_data)) == analysis_data
+
+    previous_cpu, previous_peak = measure("previous", previous_path, analysis_data, iterations)
+    single_cpu, single_peak = measure("single-pass", single_pass_path, analysis_data, iterations)
+    print(
+        f"savings: {(1 - single_cpu / previous_cpu) * 100:.0f}% CPU, "
+        f"{(1 - single_peak / previous_peak) * 100:.0f}% peak allocation"
+    )
+
+
+if __name__ == "__main__":
+    main()
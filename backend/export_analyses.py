@@ -0,0 +1,57 @@
+"""
+Export stored analyses as NDJSON, CSV or Parquet.
+
+Streams rows from the database with constant memory, so it is safe to run
+against the full job_analysis table:
+
+    python export_analyses.py --table tasks --format parquet --output tasks.parquet
+    python export_analyses.py --industry "Health Care" --start 2026-01-01 > analyses.ndjson
+"""
+
+import argparse
+import sys
+from datetime import date
+
+from app.database import get_sessionmaker
+from app.schemas import Industry
+from app.services.export_service import EXPORT_FORMATS, EXPORT_TABLES, ExportService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export stored job analyses.")
+    parser.add_argument("--table", choices=list(EXPORT_TABLES), default="analyses",
+                        help="analyses (one row per analysis), tasks or roadmap (long-form)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--industry", choices=[industry.value for industry in Industry])
+    parser.add_argument("--start", type=date.fromisoformat, help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day to include (YYYY-MM-DD)")
+    parser.add_argument("--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    SessionLocal = get_sessionmaker()
+    if SessionLocal is None:
+        print("Database not configured (set DATABASE_URL)", file=sys.stderr)
+        return 1
+
+    db = SessionLocal()
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        chunks = ExportService().stream(
+            db,
+            args.table,
+            args.format,
+            industry=args.industry,
+            start=args.start,
+            end=args.end
+        )
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
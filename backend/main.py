@@ -1,11 +1,14 @@
-from fastapi import FastAPI, Response, status, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Header, Query, Request, Response, status, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
+from datetime import date
 import os
 import json
 import logging
+import secrets
 
 load_dotenv()
 
@@ -13,43 +16,39 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Import with error handling
-try:
-    from app.database import get_db, engine, Base
-    DATABASE_AVAILABLE = engine is not None
-except Exception as e:
-    print(f"Database import failed: {e}")
-    DATABASE_AVAILABLE = False
-
-try:
-    from app.schemas import Analysis, AnalyzeRequest, AnalyzeResponse
-    from app.services.analysis_service import AnalysisService
-    from app.services.email_service import EmailService
-    SERVICES_AVAILABLE = True
-    
-    # Initialize services
-    analysis_service = AnalysisService()
-    email_service = EmailService()
-except Exception as e:
-    print(f"Services import failed: {e}")
-    SERVICES_AVAILABLE = False
+from app.database import get_db, get_engine
+from app.model_router import model_router
+from app.pool import pool_status
+from app.cache import CachedResponse, etag_matches, render_with_analysis
+from app.scheduler import QuotaExceeded, upstream_scheduler
+from app.schemas import AggregatesResponse, AnalysisHistoryResponse, AnalyzeRequest, AnalyzeResponse, BackgroundAnalysisResponse, BulkAnalyzeRequest, Industry, StoredAnalysisResponse
+from app.services.aggregate_service import AggregateService
+from app.services.analysis_service import AnalysisService, IdempotencyConflict
+from app.services.export_service import EXPORT_FORMATS, EXPORT_TABLES, MEDIA_TYPES, ExportService
+from app.services.email_service import EmailService
+from app.warmup import readiness, start_warmup
+
+# Initialize services
+analysis_service = AnalysisService()
+aggregate_service = AggregateService()
+export_service = ExportService()
+email_service = EmailService()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("Starting AI Opportunity Scanner API...")
-    
-    # Create tables if database is available
-    if DATABASE_AVAILABLE:
-        try:
-            Base.metadata.create_all(bind=engine)
-            print("Database tables created successfully")
-        except Exception as e:
-            print(f"Failed to create database tables: {e}")
-    
+
+    # Schema changes are applied by `alembic upgrade head` before the app starts.
+    # Warm the DB pool, OpenAI connection and templates without blocking startup.
+    warmup_tasks = start_warmup(email_service)
+
     yield
-    
+
     # Shutdown
+    for task in warmup_tasks:
+        task.cancel()
+    analysis_service.cancel_background()
     print("Shutting down AI Opportunity Scanner API...")
 
 app = FastAPI(title="AI Opportunity Scanner API", version="1.0.0", lifespan=lifespan)
@@ -67,6 +66,33 @@ app.add_middleware(
 async def simple_health_check():
     return "OK"
 
+@app.get("/ready")
+async def readiness_check():
+    data = {
+        "status": "ready" if readiness.ready else "warming",
+        "components": readiness.components,
+    }
+    return Response(
+        content=json.dumps(data),
+        status_code=status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        media_type="application/json"
+    )
+
+@app.get("/api/metrics/db")
+async def database_metrics():
+    engine = get_engine()
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Database not configured")
+    return pool_status(engine.pool)
+
+@app.get("/api/metrics/upstream")
+async def upstream_metrics():
+    return model_router.report()
+
+@app.get("/api/metrics/scheduler")
+async def scheduler_metrics():
+    return upstream_scheduler.snapshot()
+
 @app.get("/")
 async def root():
     return {"message": "AI Opportunity Scanner API", "status": "running"}
@@ -87,47 +113,197 @@ async def health_check():
 async def analyze_job_description_endpoint(
     request: AnalyzeRequest, 
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    idempotency_key: str | None = Header(None, max_length=255)
 ):
     try:
         # Validate job description length
         if len(request.job_description.strip()) < 50:
             raise HTTPException(status_code=400, detail="Job description must be at least 50 characters long")
         
-        # Use analysis service to analyze and save
-        analysis_id, analysis_data = await analysis_service.analyze_job_description(
+        # A retried request (same Idempotency-Key, else same session_id) gets the original result
+        result = await analysis_service.analyze_job_description(
             job_description=request.job_description,
             industry=request.industry,
             user_email=request.user_email,
-            db=db
+            session_id=request.session_id,
+            idempotency_key=idempotency_key or request.session_id
         )
         
-        # Send email asynchronously if email provided
-        if request.user_email:
+        # Send email asynchronously if email provided; a replay was already emailed
+        if request.user_email and not result.replayed:
             background_tasks.add_task(
                 email_service.send_analysis_email,
                 to_email=request.user_email,
-                analysis_id=analysis_id,
-                analysis_data=analysis_data,
+                analysis_id=result.id,
+                analysis_data=result.analysis_data,
                 frontend_url=os.getenv("FRONTEND_URL", "http://localhost:3000"),
                 session_id=request.session_id
             )
             logger.info(f"Email task queued for {request.user_email}")
         
-        # Convert analysis_data to Analysis model
-        analysis = Analysis(**analysis_data)
-        
-        return AnalyzeResponse(
-            id=analysis_id,
-            analysis=analysis
+        # analysis_json is already validated against Analysis; splice it in rather than re-encoding
+        return Response(
+            content=render_with_analysis(b'{"id":%d}' % result.id, result.analysis_json),
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"} if result.replayed else None
         )
         
     except HTTPException:
         raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         logger.error(f"Analysis endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error during analysis")
 
+# Bulk and recompute start paid analyses without a user waiting on them; set to require X-API-Key
+BACKGROUND_API_KEY = os.getenv("BACKGROUND_API_KEY")
+
+def require_background_api_key(x_api_key: str | None = Header(None)):
+    if BACKGROUND_API_KEY and not secrets.compare_digest(x_api_key or "", BACKGROUND_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-API-Key")
+
+# Exports and listing by email are disabled unless ANALYST_API_KEY is set and sent as X-API-Key
+ANALYST_API_KEY = os.getenv("ANALYST_API_KEY")
+
+def require_analyst_api_key(x_api_key: str | None = Header(None)):
+    if not ANALYST_API_KEY:
+        raise HTTPException(status_code=403, detail="Disabled; set ANALYST_API_KEY to enable")
+    if not secrets.compare_digest(x_api_key or "", ANALYST_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-API-Key")
+
+@app.post(
+    "/api/analyze/bulk",
+    response_model=BackgroundAnalysisResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_background_api_key)]
+)
+async def bulk_analyze_endpoint(request: BulkAnalyzeRequest):
+    # Bulk work yields to interactive analyses in the upstream scheduler; no emails are sent
+    for item in request.items:
+        if len(item.job_description.strip()) < 50:
+            raise HTTPException(status_code=400, detail="Job description must be at least 50 characters long")
+    try:
+        session_ids = analysis_service.submit_bulk(request.items)
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return BackgroundAnalysisResponse(accepted=len(session_ids), session_ids=session_ids)
+
+@app.post(
+    "/api/analysis/{analysis_id}/recompute",
+    response_model=BackgroundAnalysisResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_background_api_key)]
+)
+async def recompute_analysis_endpoint(analysis_id: int):
+    try:
+        session_id = await analysis_service.submit_recompute(analysis_id)
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if session_id is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return BackgroundAnalysisResponse(accepted=1, session_ids=[session_id])
+
+# A stored analysis never changes, so clients and CDNs may cache it by id forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# A session's latest analysis changes on recompute, so it is revalidated with its ETag on every use
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+def cached_analysis_response(request: Request, cached: CachedResponse, cache_control: str) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+# DB-bound endpoints below are plain functions so FastAPI runs them in its threadpool
+# instead of blocking the event loop on queries and pool checkouts
+
+@app.get("/api/analyses", response_model=AnalysisHistoryResponse)
+def list_analyses_endpoint(
+    user_email: str | None = None,
+    session_id: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    x_api_key: str | None = Header(None),
+    db: Session = Depends(get_db)
+):
+    # A session id is a secret the caller holds; an email address is not proof of ownership
+    if user_email is not None:
+        require_analyst_api_key(x_api_key)
+    try:
+        return analysis_service.list_analyses(
+            db,
+            user_email=user_email,
+            session_id=session_id,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/aggregates", response_model=AggregatesResponse)
+def aggregates_endpoint(
+    start: date | None = None,
+    end: date | None = None,
+    industry: Industry | None = None,
+    db: Session = Depends(get_db)
+):
+    return aggregate_service.get_aggregates(
+        db,
+        start=start,
+        end=end,
+        industry=industry.value if industry else None
+    )
+
+@app.get("/api/export", dependencies=[Depends(require_analyst_api_key)])
+async def export_endpoint(
+    table: str = Query("analyses", pattern="^(" + "|".join(EXPORT_TABLES) + ")$"),
+    format: str = Query("ndjson", pattern="^(" + "|".join(EXPORT_FORMATS) + ")$"),
+    industry: Industry | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    db: Session = Depends(get_db)
+):
+    try:
+        chunks = export_service.stream(
+            db,
+            table,
+            format,
+            industry=industry.value if industry else None,
+            start=start,
+            end=end
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    )
+
+@app.get("/api/analysis/session/{session_id}", response_model=StoredAnalysisResponse)
+def get_analysis_by_session_endpoint(
+    session_id: str,
+    request: Request
+):
+    cached = analysis_service.get_analysis_by_session(session_id)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return cached_analysis_response(request, cached, REVALIDATE_CACHE_CONTROL)
+
+@app.get("/api/analysis/{analysis_id}", response_model=StoredAnalysisResponse)
+def get_analysis_endpoint(
+    analysis_id: int,
+    request: Request
+):
+    cached = analysis_service.get_analysis(analysis_id)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return cached_analysis_response(request, cached, IMMUTABLE_CACHE_CONTROL)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""job_analysis baseline
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have this table
+    if sa.inspect(op.get_bind()).has_table("job_analysis"):
+        return
+
+    op.create_table(
+        "job_analysis",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_description", sa.Text(), nullable=False),
+        sa.Column("user_email", sa.String(length=255), nullable=True),
+        sa.Column("industry", sa.String(length=100), nullable=False),
+        sa.Column("analysis_result", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_job_analysis_id", "job_analysis", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_analysis_id", table_name="job_analysis")
+    op.drop_table("job_analysis")
@@ -0,0 +1,32 @@
+"""job_analysis session_id
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("job_analysis")}
+    if "session_id" in columns:
+        return
+
+    op.add_column("job_analysis", sa.Column("session_id", sa.String(length=255), nullable=True))
+    op.create_index("ix_job_analysis_session_id", "job_analysis", ["session_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_analysis_session_id", table_name="job_analysis")
+    op.drop_column("job_analysis", "session_id")
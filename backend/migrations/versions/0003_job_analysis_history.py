@@ -0,0 +1,108 @@
+"""job_analysis history indexes and summary columns
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {column["name"] for column in inspector.get_columns("job_analysis")}
+    indexes = {index["name"] for index in inspector.get_indexes("job_analysis")}
+
+    if "job_title" not in columns:
+        op.add_column("job_analysis", sa.Column("job_title", sa.String(length=255), nullable=True))
+    if "total_annual_savings" not in columns:
+        op.add_column("job_analysis", sa.Column("total_annual_savings", sa.Float(), nullable=True))
+
+    # The composite (session_id, created_at, id) index covers plain session_id lookups
+    if "ix_job_analysis_session_id" in indexes:
+        op.drop_index("ix_job_analysis_session_id", table_name="job_analysis")
+    if "ix_job_analysis_user_email_created_at" not in indexes:
+        op.create_index(
+            "ix_job_analysis_user_email_created_at", "job_analysis", ["user_email", "created_at", "id"]
+        )
+    if "ix_job_analysis_session_id_created_at" not in indexes:
+        op.create_index(
+            "ix_job_analysis_session_id_created_at", "job_analysis", ["session_id", "created_at", "id"]
+        )
+
+    backfill_summary_columns(bind)
+
+
+def number_or_none(value):
+    # Old rows hold raw model output, which sometimes has "N/A" or "$1.2M" where a number belongs
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def backfill_summary_columns(bind) -> None:
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            """
+            UPDATE job_analysis SET
+                job_title = LEFT(analysis_result -> 'extracted_job_data' ->> 'job_title', 255),
+                total_annual_savings = CASE
+                    WHEN jsonb_typeof(analysis_result::jsonb -> 'executive_summary' -> 'total_annual_savings') = 'number'
+                    THEN (analysis_result::jsonb -> 'executive_summary' ->> 'total_annual_savings')::float
+                END
+            WHERE job_title IS NULL AND total_annual_savings IS NULL
+            """
+        )
+        return
+
+    job_analysis = sa.table(
+        "job_analysis",
+        sa.column("id", sa.Integer),
+        sa.column("analysis_result", sa.JSON),
+        sa.column("job_title", sa.String),
+        sa.column("total_annual_savings", sa.Float),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(job_analysis.c.id, job_analysis.c.analysis_result)
+            .where(job_analysis.c.id > last_id)
+            .order_by(job_analysis.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            result = row.analysis_result or {}
+            job_title = (result.get("extracted_job_data") or {}).get("job_title")
+            total_annual_savings = (result.get("executive_summary") or {}).get("total_annual_savings")
+            bind.execute(
+                job_analysis.update()
+                .where(job_analysis.c.id == row.id)
+                .values(
+                    job_title=job_title[:255] if job_title else None,
+                    total_annual_savings=number_or_none(total_annual_savings),
+                )
+            )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_analysis_session_id_created_at", table_name="job_analysis")
+    op.drop_index("ix_job_analysis_user_email_created_at", table_name="job_analysis")
+    op.create_index("ix_job_analysis_session_id", "job_analysis", ["session_id"])
+    op.drop_column("job_analysis", "total_annual_savings")
+    op.drop_column("job_analysis", "job_title")
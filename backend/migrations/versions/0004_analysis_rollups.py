@@ -0,0 +1,211 @@
+"""job_analysis summary columns and rollup tables
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+job_analysis = sa.table(
+    "job_analysis",
+    sa.column("id", sa.Integer),
+    sa.column("industry", sa.String),
+    sa.column("analysis_result", sa.JSON),
+    sa.column("job_title", sa.String),
+    sa.column("job_level", sa.String),
+    sa.column("total_annual_savings", sa.Float),
+    sa.column("roi_percentage", sa.Float),
+    sa.column("automation_potential_percentage", sa.Float),
+    sa.column("is_fallback", sa.Boolean),
+    sa.column("created_at", sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {column["name"] for column in inspector.get_columns("job_analysis")}
+    indexes = {index["name"] for index in inspector.get_indexes("job_analysis")}
+
+    if "job_level" not in columns:
+        op.add_column("job_analysis", sa.Column("job_level", sa.String(length=50), nullable=True))
+    if "roi_percentage" not in columns:
+        op.add_column("job_analysis", sa.Column("roi_percentage", sa.Float(), nullable=True))
+    if "automation_potential_percentage" not in columns:
+        op.add_column("job_analysis", sa.Column("automation_potential_percentage", sa.Float(), nullable=True))
+    if "is_fallback" not in columns:
+        op.add_column(
+            "job_analysis",
+            sa.Column("is_fallback", sa.Boolean(), nullable=False, server_default=sa.false()),
+        )
+
+    if "ix_job_analysis_industry_created_at" not in indexes:
+        op.create_index("ix_job_analysis_industry_created_at", "job_analysis", ["industry", "created_at"])
+    if "ix_job_analysis_job_title" not in indexes:
+        op.create_index("ix_job_analysis_job_title", "job_analysis", ["job_title"])
+
+    if not inspector.has_table("analysis_daily_rollup"):
+        op.create_table(
+            "analysis_daily_rollup",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("industry", sa.String(length=100), primary_key=True),
+            sa.Column("analysis_count", sa.Integer(), nullable=False),
+            sa.Column("fallback_count", sa.Integer(), nullable=False),
+            sa.Column("total_annual_savings_sum", sa.Float(), nullable=False),
+            sa.Column("roi_percentage_sum", sa.Float(), nullable=False),
+            sa.Column("automation_potential_sum", sa.Float(), nullable=False),
+        )
+    if not inspector.has_table("job_title_rollup"):
+        op.create_table(
+            "job_title_rollup",
+            sa.Column("job_title_key", sa.String(length=255), primary_key=True),
+            sa.Column("industry", sa.String(length=100), primary_key=True),
+            sa.Column("job_title", sa.String(length=255), nullable=False),
+            sa.Column("analysis_count", sa.Integer(), nullable=False),
+        )
+
+    backfill_summary_columns(bind)
+    rebuild_rollups()
+
+
+def number_or_none(value):
+    # Old rows hold raw model output, which sometimes has "N/A" or "150%" where a number belongs
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def backfill_summary_columns(bind) -> None:
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            """
+            UPDATE job_analysis SET
+                job_level = LEFT(analysis_result -> 'extracted_job_data' ->> 'job_level', 50),
+                roi_percentage = CASE
+                    WHEN jsonb_typeof(analysis_result::jsonb -> 'roi_analysis' -> 'roi_percentage') = 'number'
+                    THEN (analysis_result::jsonb -> 'roi_analysis' ->> 'roi_percentage')::float
+                END,
+                automation_potential_percentage = CASE
+                    WHEN jsonb_typeof(
+                        analysis_result::jsonb -> 'executive_summary' -> 'automation_potential_percentage'
+                    ) = 'number'
+                    THEN (analysis_result::jsonb -> 'executive_summary' ->> 'automation_potential_percentage')::float
+                END,
+                is_fallback = (analysis_result -> 'extracted_job_data') IS NULL
+            WHERE roi_percentage IS NULL
+            """
+        )
+        return
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(job_analysis.c.id, job_analysis.c.analysis_result)
+            .where(job_analysis.c.id > last_id)
+            .order_by(job_analysis.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            result = row.analysis_result or {}
+            roi_percentage = (result.get("roi_analysis") or {}).get("roi_percentage")
+            automation_potential = (result.get("executive_summary") or {}).get("automation_potential_percentage")
+            job_level = (result.get("extracted_job_data") or {}).get("job_level")
+            bind.execute(
+                job_analysis.update()
+                .where(job_analysis.c.id == row.id)
+                .values(
+                    job_level=job_level[:50] if job_level else None,
+                    roi_percentage=number_or_none(roi_percentage),
+                    automation_potential_percentage=number_or_none(automation_potential),
+                    # Rows written before is_fallback existed: only fallbacks lack extracted data
+                    is_fallback="extracted_job_data" not in result,
+                )
+            )
+        last_id = rows[-1].id
+
+
+def rebuild_rollups() -> None:
+    daily_rollup = sa.table(
+        "analysis_daily_rollup",
+        *(sa.column(name) for name in (
+            "day", "industry", "analysis_count", "fallback_count",
+            "total_annual_savings_sum", "roi_percentage_sum", "automation_potential_sum",
+        )),
+    )
+    title_rollup = sa.table(
+        "job_title_rollup",
+        *(sa.column(name) for name in ("job_title_key", "industry", "job_title", "analysis_count")),
+    )
+    op.execute(daily_rollup.delete())
+    op.execute(title_rollup.delete())
+
+    day = sa.func.date(job_analysis.c.created_at)
+    op.execute(
+        daily_rollup.insert().from_select(
+            [
+                "day", "industry", "analysis_count", "fallback_count",
+                "total_annual_savings_sum", "roi_percentage_sum", "automation_potential_sum",
+            ],
+            sa.select(
+                day,
+                job_analysis.c.industry,
+                sa.func.count(),
+                sa.func.sum(sa.case((job_analysis.c.is_fallback, 1), else_=0)),
+                sa.func.coalesce(sa.func.sum(job_analysis.c.total_annual_savings), 0),
+                sa.func.coalesce(sa.func.sum(job_analysis.c.roi_percentage), 0),
+                sa.func.coalesce(sa.func.sum(job_analysis.c.automation_potential_percentage), 0),
+            )
+            .where(job_analysis.c.created_at.isnot(None))
+            .group_by(day, job_analysis.c.industry),
+        )
+    )
+
+    # Count exact titles in SQL, then merge them under the runtime key in Python. Distinct
+    # (title, industry) pairs are far fewer than rows, so this stays small on large tables.
+    title_rows = op.get_bind().execute(
+        sa.select(job_analysis.c.job_title, job_analysis.c.industry, sa.func.count().label("analysis_count"))
+        .where(job_analysis.c.job_title.isnot(None))
+        .group_by(job_analysis.c.job_title, job_analysis.c.industry)
+    )
+    title_counts = {}
+    for row in title_rows:
+        key = (normalize_job_title(row.job_title), row.industry)
+        job_title, analysis_count = title_counts.get(key, (row.job_title[:255], 0))
+        title_counts[key] = (min(job_title, row.job_title[:255]), analysis_count + row.analysis_count)
+
+    if title_counts:
+        op.bulk_insert(title_rollup, [
+            {"job_title_key": key, "industry": industry, "job_title": job_title, "analysis_count": analysis_count}
+            for (key, industry), (job_title, analysis_count) in title_counts.items()
+        ])
+
+
+def normalize_job_title(job_title):
+    # Copy of aggregate_service.normalize_job_title, so backfilled keys match the ones written at runtime
+    return " ".join(job_title.lower().split())[:255]
+
+
+def downgrade() -> None:
+    op.drop_table("job_title_rollup")
+    op.drop_table("analysis_daily_rollup")
+    op.drop_index("ix_job_analysis_job_title", table_name="job_analysis")
+    op.drop_index("ix_job_analysis_industry_created_at", table_name="job_analysis")
+    op.drop_column("job_analysis", "is_fallback")
+    op.drop_column("job_analysis", "automation_potential_percentage")
+    op.drop_column("job_analysis", "roi_percentage")
+    op.drop_column("job_analysis", "job_level")
@@ -0,0 +1,218 @@
+"""content-addressed job descriptions and compressed analysis payloads
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+from datetime import datetime
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+import zstandard
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONVERT_BATCH_SIZE = 500
+
+# Payload encoding as of this revision; kept local so later storage changes don't alter it
+EXTRACTED_DATA_REF = "@description"
+
+
+def hash_content(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress_json(data):
+    return zstandard.ZstdCompressor(level=3).compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+
+def decompress_json(blob):
+    return json.loads(zstandard.ZstdDecompressor().decompress(blob))
+
+
+def pack_analysis(analysis_data, description_extracted):
+    extracted = analysis_data.get("extracted_job_data")
+    if extracted is not None and extracted == description_extracted:
+        analysis_data = {**analysis_data, "extracted_job_data": EXTRACTED_DATA_REF}
+    return compress_json(analysis_data)
+
+
+def unpack_analysis(payload, description_extracted):
+    analysis_data = decompress_json(payload)
+    if analysis_data.get("extracted_job_data") == EXTRACTED_DATA_REF:
+        analysis_data["extracted_job_data"] = description_extracted
+    return analysis_data
+
+job_analysis = sa.table(
+    "job_analysis",
+    sa.column("id", sa.Integer),
+    sa.column("job_description", sa.Text),
+    sa.column("analysis_result", sa.JSON),
+    sa.column("description_hash", sa.String),
+    sa.column("analysis_payload", sa.LargeBinary),
+)
+
+job_description_blob = sa.table(
+    "job_description_blob",
+    sa.column("content_hash", sa.String),
+    sa.column("content", sa.Text),
+    sa.column("extracted_job_data", sa.LargeBinary),
+    sa.column("created_at", sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table("job_description_blob"):
+        op.create_table(
+            "job_description_blob",
+            sa.Column("content_hash", sa.String(length=64), primary_key=True),
+            sa.Column("content", sa.Text(), nullable=False),
+            sa.Column("extracted_job_data", sa.LargeBinary(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+
+    columns = {column["name"] for column in inspector.get_columns("job_analysis")}
+    if "analysis_result" not in columns:
+        # Table was created from the current models; nothing to convert
+        return
+
+    if "description_hash" not in columns:
+        op.add_column("job_analysis", sa.Column("description_hash", sa.String(length=64), nullable=True))
+    if "analysis_payload" not in columns:
+        op.add_column("job_analysis", sa.Column("analysis_payload", sa.LargeBinary(), nullable=True))
+
+    convert_rows(bind)
+
+    with op.batch_alter_table("job_analysis") as batch:
+        batch.alter_column("description_hash", existing_type=sa.String(length=64), nullable=False)
+        batch.alter_column("analysis_payload", existing_type=sa.LargeBinary(), nullable=False)
+        batch.create_foreign_key(
+            "fk_job_analysis_description_hash", "job_description_blob", ["description_hash"], ["content_hash"]
+        )
+        batch.create_index("ix_job_analysis_description_hash", ["description_hash"])
+        batch.drop_column("job_description")
+        batch.drop_column("analysis_result")
+
+
+def convert_rows(bind) -> None:
+    """Move descriptions into job_description_blob and compress payloads, one batch at a time."""
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(job_analysis.c.id, job_analysis.c.job_description, job_analysis.c.analysis_result)
+            .where(job_analysis.c.id > last_id)
+            .where(job_analysis.c.analysis_payload.is_(None))
+            .order_by(job_analysis.c.id)
+            .limit(CONVERT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        # Extraction results of this batch's descriptions only, so memory stays bounded by the batch
+        # size however large the table is; payloads reference them
+        content_hashes = {row.id: hash_content(row.job_description) for row in rows}
+        description_extracted = {
+            blob.content_hash: decompress_json(blob.extracted_job_data) if blob.extracted_job_data else None
+            for blob in bind.execute(
+                sa.select(job_description_blob.c.content_hash, job_description_blob.c.extracted_job_data)
+                .where(job_description_blob.c.content_hash.in_(set(content_hashes.values())))
+            )
+        }
+
+        new_blobs = {}
+        updates = []
+        for row in rows:
+            content_hash = content_hashes[row.id]
+            result = row.analysis_result or {}
+            if content_hash not in description_extracted:
+                description_extracted[content_hash] = result.get("extracted_job_data")
+                new_blobs[content_hash] = {
+                    "content_hash": content_hash,
+                    "content": row.job_description,
+                    "extracted_job_data": (
+                        compress_json(result["extracted_job_data"]) if result.get("extracted_job_data") else None
+                    ),
+                    "created_at": datetime.utcnow(),
+                }
+            updates.append({
+                "row_id": row.id,
+                "description_hash": content_hash,
+                "analysis_payload": pack_analysis(result, description_extracted[content_hash]),
+            })
+
+        if new_blobs:
+            bind.execute(job_description_blob.insert(), list(new_blobs.values()))
+        bind.execute(
+            job_analysis.update()
+            .where(job_analysis.c.id == sa.bindparam("row_id"))
+            .values(
+                description_hash=sa.bindparam("description_hash"),
+                analysis_payload=sa.bindparam("analysis_payload"),
+            ),
+            updates,
+        )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    op.add_column("job_analysis", sa.Column("job_description", sa.Text(), nullable=True))
+    op.add_column("job_analysis", sa.Column("analysis_result", sa.JSON(), nullable=True))
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                job_analysis.c.id,
+                job_analysis.c.analysis_payload,
+                job_description_blob.c.content,
+                job_description_blob.c.extracted_job_data,
+            )
+            .join(job_description_blob, job_description_blob.c.content_hash == job_analysis.c.description_hash)
+            .where(job_analysis.c.id > last_id)
+            .order_by(job_analysis.c.id)
+            .limit(CONVERT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            job_analysis.update()
+            .where(job_analysis.c.id == sa.bindparam("row_id"))
+            .values(
+                job_description=sa.bindparam("job_description"),
+                analysis_result=sa.bindparam("analysis_result"),
+            ),
+            [
+                {
+                    "row_id": row.id,
+                    "job_description": row.content,
+                    "analysis_result": unpack_analysis(
+                        row.analysis_payload,
+                        decompress_json(row.extracted_job_data) if row.extracted_job_data else None,
+                    ),
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table("job_analysis") as batch:
+        batch.alter_column("job_description", existing_type=sa.Text(), nullable=False)
+        batch.alter_column("analysis_result", existing_type=sa.JSON(), nullable=False)
+        batch.drop_index("ix_job_analysis_description_hash")
+        batch.drop_constraint("fk_job_analysis_description_hash", type_="foreignkey")
+        batch.drop_column("description_hash")
+        batch.drop_column("analysis_payload")
+    op.drop_table("job_description_blob")
@@ -0,0 +1,186 @@
+"""store the validated Analysis JSON as the payload
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import List, Sequence, Union
+import json
+
+from alembic import op
+from pydantic import BaseModel
+import sqlalchemy as sa
+import zstandard
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONVERT_BATCH_SIZE = 500
+
+# Marker used by revision 0005 for extracted_job_data identical to the description's copy
+EXTRACTED_DATA_REF = "@description"
+
+job_analysis = sa.table(
+    "job_analysis",
+    sa.column("id", sa.Integer),
+    sa.column("analysis_payload", sa.LargeBinary),
+    sa.column("extracted_job_data", sa.LargeBinary),
+)
+
+
+# Frozen copy of app.schemas.Analysis as of this revision, so later schema changes
+# don't change what this migration writes
+
+
+class TaskBreakdown(BaseModel):
+    task_name: str
+    description: str
+    automation_potential: float
+    estimated_time_savings_hours_per_week: float
+    estimated_annual_savings: float
+    automation_approach: str
+    implementation_difficulty: str
+
+
+class ExecutiveSummary(BaseModel):
+    total_annual_savings: float
+    automation_potential_percentage: float
+    payback_period_months: float
+    implementation_complexity: str
+
+
+class AutomationWorkflow(BaseModel):
+    current_process: List[str]
+    automated_process: List[str]
+    ai_integration_points: List[str]
+
+
+class ROIAnalysis(BaseModel):
+    current_annual_cost: float
+    automation_implementation_cost: float
+    annual_savings: float
+    net_savings_year_1: float
+    net_savings_year_3: float
+    roi_percentage: float
+
+
+class ImplementationPhase(BaseModel):
+    phase: str
+    timeline: str
+    tasks: List[str]
+    estimated_savings: float
+    complexity: str
+
+
+class Analysis(BaseModel):
+    executive_summary: ExecutiveSummary
+    task_breakdown: List[TaskBreakdown]
+    automation_workflow: AutomationWorkflow
+    roi_analysis: ROIAnalysis
+    implementation_roadmap: List[ImplementationPhase]
+
+
+def compress(raw):
+    return zstandard.ZstdCompressor(level=3).compress(raw)
+
+
+def decompress(blob):
+    return zstandard.ZstdDecompressor().decompress(blob)
+
+
+def compact_json(data):
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("job_analysis")}
+    if "extracted_job_data" in columns:
+        return
+
+    op.add_column("job_analysis", sa.Column("extracted_job_data", sa.LargeBinary(), nullable=True))
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(job_analysis.c.id, job_analysis.c.analysis_payload)
+            .where(job_analysis.c.id > last_id)
+            .order_by(job_analysis.c.id)
+            .limit(CONVERT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            analysis_data = json.loads(decompress(row.analysis_payload))
+            extracted = analysis_data.get("extracted_job_data")
+            try:
+                analysis_json = Analysis.model_validate(analysis_data).model_dump_json().encode()
+            except ValueError:
+                # Rows stored before validation moved ahead of the insert; keep what we have
+                analysis_json = compact_json({
+                    key: value for key, value in analysis_data.items()
+                    if key in Analysis.model_fields
+                })
+            updates.append({
+                "row_id": row.id,
+                "analysis_payload": compress(analysis_json),
+                "extracted_job_data": (
+                    compress(compact_json(extracted)) if extracted not in (None, EXTRACTED_DATA_REF) else None
+                ),
+            })
+
+        bind.execute(
+            job_analysis.update()
+            .where(job_analysis.c.id == sa.bindparam("row_id"))
+            .values(
+                analysis_payload=sa.bindparam("analysis_payload"),
+                extracted_job_data=sa.bindparam("extracted_job_data"),
+            ),
+            updates,
+        )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    # Revision 0005 payloads embed extracted_job_data, using the reference marker when absent here
+    bind = op.get_bind()
+    is_fallback = sa.column("is_fallback", sa.Boolean)
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(job_analysis.c.id, job_analysis.c.analysis_payload, job_analysis.c.extracted_job_data, is_fallback)
+            .select_from(job_analysis)
+            .where(job_analysis.c.id > last_id)
+            .order_by(job_analysis.c.id)
+            .limit(CONVERT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            analysis_data = json.loads(decompress(row.analysis_payload))
+            if row.extracted_job_data is not None:
+                analysis_data["extracted_job_data"] = json.loads(decompress(row.extracted_job_data))
+            elif not row.is_fallback:
+                analysis_data["extracted_job_data"] = EXTRACTED_DATA_REF
+            if row.is_fallback:
+                analysis_data["is_fallback"] = True
+            updates.append({"row_id": row.id, "analysis_payload": compress(compact_json(analysis_data))})
+
+        bind.execute(
+            job_analysis.update()
+            .where(job_analysis.c.id == sa.bindparam("row_id"))
+            .values(analysis_payload=sa.bindparam("analysis_payload")),
+            updates,
+        )
+        last_id = rows[-1].id
+
+    op.drop_column("job_analysis", "extracted_job_data")
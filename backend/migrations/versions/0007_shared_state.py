@@ -0,0 +1,36 @@
+"""shared_state table for cross-worker caches and rate budgets
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("shared_state"):
+        op.create_table(
+            "shared_state",
+            sa.Column("key", sa.String(length=512), primary_key=True),
+            sa.Column("value", sa.LargeBinary(), nullable=True),
+            sa.Column("counter", sa.Integer(), nullable=False),
+            sa.Column("expires_at", sa.Float(), nullable=True),
+        )
+        op.create_index("ix_shared_state_expires_at", "shared_state", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_shared_state_expires_at", table_name="shared_state")
+    op.drop_table("shared_state")
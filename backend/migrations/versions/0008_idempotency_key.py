@@ -0,0 +1,55 @@
+"""job_analysis idempotency_key with a unique index
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+job_analysis = sa.table(
+    "job_analysis",
+    sa.column("id", sa.Integer),
+    sa.column("session_id", sa.String),
+    sa.column("idempotency_key", sa.String),
+    sa.column("is_fallback", sa.Boolean),
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("job_analysis")}
+    indexes = {index["name"] for index in inspector.get_indexes("job_analysis")}
+
+    if "idempotency_key" not in columns:
+        op.add_column("job_analysis", sa.Column("idempotency_key", sa.String(length=255), nullable=True))
+
+        # Existing sessions: the first successful analysis is the one a retry gets back
+        first_per_session = (
+            sa.select(sa.func.min(job_analysis.c.id))
+            .where(job_analysis.c.session_id.isnot(None), job_analysis.c.is_fallback == sa.false())
+            .group_by(job_analysis.c.session_id)
+        )
+        op.execute(
+            job_analysis.update()
+            .where(job_analysis.c.id.in_(first_per_session))
+            .values(idempotency_key=job_analysis.c.session_id)
+        )
+
+    if "uq_job_analysis_idempotency_key" not in indexes:
+        op.create_index("uq_job_analysis_idempotency_key", "job_analysis", ["idempotency_key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uq_job_analysis_idempotency_key", table_name="job_analysis")
+    op.drop_column("job_analysis", "idempotency_key")
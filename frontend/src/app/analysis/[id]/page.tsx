@@ -3,6 +3,7 @@
 import { useEffect, useState } from 'react';
 import { useParams, useRouter } from 'next/navigation';
 import { getAnalysisById, SavedAnalysis } from '@/lib/history';
+import { getStoredAnalysis } from '@/lib/api';
 import ResultsDashboard from '@/components/ResultsDashboard';
 import HistorySidebar from '@/components/HistorySidebar';
 import Header from '@/components/Header';
@@ -18,11 +19,34 @@ export default function AnalysisPage() {
 
 	useEffect(() => {
 		const id = params.id as string;
-		if (id) {
-			const savedAnalysis = getAnalysisById(id);
+		if (!id) {
+			setLoading(false);
+			return;
+		}
+
+		const savedAnalysis = getAnalysisById(id);
+		if (savedAnalysis) {
 			setAnalysis(savedAnalysis);
+			setLoading(false);
+			return;
 		}
-		setLoading(false);
+
+		// Not in this browser session (e.g. opened from the email link) - load the stored copy
+		getStoredAnalysis(id)
+			.then((stored) => {
+				if (stored) {
+					setAnalysis({
+						id,
+						title: stored.job_title || 'Job Analysis',
+						jobDescription: stored.job_description,
+						industry: stored.industry,
+						analysis: stored.analysis,
+						createdAt: stored.created_at,
+					});
+				}
+			})
+			.catch((error) => console.error('Error loading stored analysis:', error))
+			.finally(() => setLoading(false));
 	}, [params.id]);
 
 	const handleStartOver = () => {
@@ -59,6 +59,16 @@ export interface AnalyzeResponse {
   analysis: Analysis
 }
 
+export interface StoredAnalysisResponse {
+  id: number
+  session_id: string | null
+  industry: string
+  job_title: string | null
+  job_description: string
+  created_at: string
+  analysis: Analysis
+}
+
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
 
 export async function analyzeJobDescription(data: AnalyzeRequest): Promise<AnalyzeResponse> {
@@ -78,6 +88,20 @@ export async function analyzeJobDescription(data: AnalyzeRequest): Promise<Analy
   return response.json()
 }
 
+export async function getStoredAnalysis(sessionId: string): Promise<StoredAnalysisResponse | null> {
+  const response = await fetch(`${API_BASE_URL}/api/analysis/session/${encodeURIComponent(sessionId)}`)
+
+  if (response.status === 404) {
+    return null
+  }
+
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`)
+  }
+
+  return response.json()
+}
+
 export async function healthCheck(): Promise<{ status: string; message: string }> {
   const response = await fetch(`${API_BASE_URL}/api/health`)
   